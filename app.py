@@ -1,8 +1,13 @@
 from flask import Flask, render_template, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -21,7 +26,12 @@ import io
 import json
 import os
 import re
+import shutil
 import sqlite3
+import stat
+import tempfile
+import threading
+import time
 
 # Load environment variables
 load_dotenv()
@@ -33,7 +43,46 @@ try:
 except ImportError:
     PDF_SUPPORT = False
 
+# Optional: orjson für schnellere JSON-Verarbeitung (Fallback: json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def json_loads(data):
+    """Parst JSON aus str oder bytes (orjson falls verfügbar)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    """Serialisiert nach kompaktem JSON-String (orjson falls verfügbar)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON-Provider auf Basis von orjson (gleiche Ausgabe wie der Standard-Provider)."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
 
 # Data directory for storing files
 DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(__file__), 'data'))
@@ -98,10 +147,12 @@ def get_export_dir(monat_str, subfolder=None):
     return export_path
 
 
+@lru_cache(maxsize=4096)
 def parse_datum(datum_str):
     """
     Parst ein Datum-String (z.B. '23.11.2025') und gibt ein datetime-Objekt zurück.
     Fallback: datetime.min für ungültige Daten (sortiert ans Ende).
+    Gecacht, da Excel-, PDF- und ZIP-Export dieselben Daten mehrfach sortieren.
     """
     if not datum_str:
         return datetime.min
@@ -116,6 +167,32 @@ def parse_datum(datum_str):
     return datetime.min
 
 
+def parse_betrag(value):
+    """
+    Wandelt einen Betrag (Zahl oder String wie '12,34', '12.34', '1.234,56') in float um.
+    Leere Werte ergeben 0.0.
+    """
+    if value is None or value == '':
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).replace('€', '').strip()
+    if ',' in text:
+        # Deutsches Format: Punkt als Tausendertrenner, Komma als Dezimaltrenner
+        text = text.replace('.', '').replace(',', '.')
+    return float(text) if text else 0.0
+
+
+def get_datum_iso(datum):
+    """
+    Leitet die Spalte datum_iso der ausgaben-Tabelle aus dem Datum einer Ausgabe ab
+    (JJJJ-MM-TT oder '' - ungültig/leer sortiert nach vorne wie datetime.min).
+    cli.py schreibt die Spalte mit derselben Logik.
+    """
+    parsed = parse_datum(datum) if isinstance(datum, str) else datetime.min
+    return parsed.strftime('%Y-%m-%d') if parsed != datetime.min else ''
+
+
 def sort_expenses_by_date(expenses):
     """Sortiert eine Liste von Expenses nach Datum (aufsteigend)."""
     return sorted(expenses, key=lambda e: parse_datum(e.get('datum', '')))
@@ -128,27 +205,126 @@ def get_content_hash(content):
     return hasher.hexdigest()
 
 
+# Zuletzt geladener Cache samt (mtime_ns, Größe) der Datei.
+# Der gemerkte Dict wird an alle Request-Threads ausgegeben und deshalb nie verändert:
+# Änderungen laufen über update_cache() (Kopie + atomares Speichern unter _cache_lock).
+_cache_state = {'stamp': None, 'data': {}}
+_cache_lock = threading.Lock()
+
+# umask des Prozesses (os.umask lässt sich nur setzend abfragen)
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def get_cache_stamp():
+    """Liefert (mtime_ns, Größe) der Cache-Datei oder None, wenn sie fehlt."""
+    try:
+        st = os.stat(CACHE_FILE)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
 def load_cache():
-    """Lädt den Cache aus der JSON-Datei"""
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return {}
-    return {}
+    """
+    Lädt den Cache aus der JSON-Datei (neu eingelesen nur, wenn sich die Datei geändert hat).
+    Das Ergebnis ist geteilt und darf nicht verändert werden.
+    """
+    stamp = get_cache_stamp()
+    if stamp is None:
+        return {}
+    if _cache_state['stamp'] == stamp:
+        return _cache_state['data']
+    try:
+        with open(CACHE_FILE, 'rb') as f:
+            data = json_loads(f.read())
+    except (json.JSONDecodeError, IOError):
+        # Unlesbar (z.B. von einem älteren Writer halb geschrieben): letzten guten Stand behalten
+        return _cache_state['data']
+    _cache_state['stamp'] = stamp
+    _cache_state['data'] = data
+    return data
+
+
+def get_cache_file_mode():
+    """Rechte der bestehenden Cache-Datei, sonst 0644 abzüglich umask."""
+    try:
+        return stat.S_IMODE(os.stat(CACHE_FILE).st_mode)
+    except OSError:
+        return 0o644 & ~UMASK
 
 
 def save_cache(cache):
-    """Speichert den Cache in die JSON-Datei"""
+    """
+    Speichert den Cache in die JSON-Datei.
+    Geschrieben wird in eine Temp-Datei im selben Verzeichnis, die per os.replace atomar
+    an die Stelle der alten tritt - andere Worker und cli.py sehen nie eine halb geschriebene Datei.
+    """
+    tmp_path = None
     try:
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cache, f, ensure_ascii=False, indent=2)
+        with tempfile.NamedTemporaryFile('wb', dir=DATA_DIR, prefix='.beleg_cache.',
+                                         suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            if ORJSON_AVAILABLE:
+                f.write(orjson.dumps(cache, option=orjson.OPT_INDENT_2))
+            else:
+                f.write(json.dumps(cache, ensure_ascii=False, indent=2).encode('utf-8'))
+        os.chmod(tmp_path, get_cache_file_mode())
+        os.replace(tmp_path, CACHE_FILE)
+        # Gerade geschriebenen Stand merken, damit load_cache() ihn nicht erneut parst
+        _cache_state['stamp'] = get_cache_stamp()
+        _cache_state['data'] = cache
     except IOError as e:
         print(f"Cache konnte nicht gespeichert werden: {e}")
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def update_cache(file_hash, entry):
+    """Setzt einen Cache-Eintrag: frisch laden, kopieren, ergänzen und atomar speichern."""
+    with _cache_lock:
+        cache = dict(load_cache())
+        cache[file_hash] = entry
+        save_cache(cache)
+
+
+def publish_key_file(key_file, key):
+    """Legt die Key-Datei exklusiv an; FileExistsError, wenn sie schon existiert."""
+    # Bevorzugt vollständig in eine Temp-Datei schreiben und per os.link veröffentlichen,
+    # so sieht kein anderer Prozess eine halb geschriebene Datei
+    with tempfile.NamedTemporaryFile('wb', dir=DATA_DIR, prefix='.secret.key.', delete=False) as f:
+        f.write(key)
+    try:
+        os.link(f.name, key_file)
+        return
+    except FileExistsError:
+        raise
+    except OSError:
+        # Dateisystem ohne Hardlinks (z.B. vfat, manche SMB/NAS-Mounts): per O_EXCL anlegen
+        pass
+    finally:
+        os.remove(f.name)
+
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+
+
+def read_key_file(key_file):
+    """Liest den Key eines anderen Prozesses; wartet kurz, falls er ihn gerade noch schreibt."""
+    for _ in range(50):
+        with open(key_file, 'rb') as f:
+            key = f.read()
+        if len(key) >= 44:  # Fernet-Keys sind 44 Zeichen (base64)
+            return key
+        time.sleep(0.01)
+    return key
 
 
 # Encryption key - aus Umgebungsvariable oder Fallback auf Datei
+# (erst bei Bedarf ermittelt und danach pro Prozess gemerkt)
+@lru_cache(maxsize=None)
 def get_encryption_key():
     # Priorität 1: Umgebungsvariable
     env_key = os.environ.get('ENCRYPTION_KEY')
@@ -162,41 +338,54 @@ def get_encryption_key():
         with open(key_file, 'rb') as f:
             return f.read()
 
-    # Priorität 3: Neuen Key generieren und Warnung ausgeben
+    # Priorität 3: Neuen Key generieren und exklusiv anlegen: starten mehrere Worker
+    # gleichzeitig, gewinnt genau ein Key, die anderen lesen ihn
     key = Fernet.generate_key()
+    os.makedirs(DATA_DIR, exist_ok=True)
+    try:
+        publish_key_file(key_file, key)
+    except FileExistsError:
+        # Ein anderer Prozess war schneller - dessen Key verwenden
+        return read_key_file(key_file)
+
     print(f"⚠️  WARNUNG: Kein ENCRYPTION_KEY in .env gefunden!")
     print(f"   Generierter Key (bitte in .env speichern):")
     print(f"   ENCRYPTION_KEY={key.decode()}")
-
-    # Key auch in Datei speichern als Backup
-    os.makedirs(DATA_DIR, exist_ok=True)
-    with open(key_file, 'wb') as f:
-        f.write(key)
-
     return key
 
-ENCRYPTION_KEY = get_encryption_key()
-cipher = Fernet(ENCRYPTION_KEY)
+# Fernet leitet Signatur- und AES-Schlüssel einmalig im Konstruktor ab,
+# daher eine Instanz pro Prozess wiederverwenden
+@lru_cache(maxsize=None)
+def get_cipher():
+    return Fernet(get_encryption_key())
 
 def encrypt_data(data):
+    # Leere Werte (z.B. keine BIC) werden als NULL gespeichert, ohne zu verschlüsseln
     if not data:
         return None
-    return cipher.encrypt(data.encode()).decode()
+    return get_cipher().encrypt(data.encode()).decode()
 
 def decrypt_data(encrypted_data):
     if not encrypted_data:
         return None
-    return cipher.decrypt(encrypted_data.encode()).decode()
+    return get_cipher().decrypt(encrypted_data.encode()).decode()
 
 DATABASE = os.path.join(DATA_DIR, 'spesen.db')
 
 def get_db():
     conn = sqlite3.connect(DATABASE)
     conn.row_factory = sqlite3.Row
+    # Im WAL-Modus genügt NORMAL: kein fsync pro Commit, Datenbank bleibt konsistent
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=268435456')
     return conn
 
 def init_db():
     with get_db() as conn:
+        # WAL wird in der Datenbankdatei gespeichert und gilt für alle späteren Verbindungen;
+        # Lesezugriffe blockieren dann nicht mehr während eines Speichervorgangs
+        conn.execute('PRAGMA journal_mode=WAL')
         conn.execute('''
             CREATE TABLE IF NOT EXISTS abrechnungen (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -216,9 +405,20 @@ def init_db():
                 abrechnung_id INTEGER NOT NULL,
                 kategorie TEXT NOT NULL,
                 daten TEXT NOT NULL,
+                datum_iso TEXT,
                 FOREIGN KEY (abrechnung_id) REFERENCES abrechnungen(id) ON DELETE CASCADE
             )
         ''')
+        # Migration: Datum als eigene Spalte (aus daten abgeleitet) für die Sortierung
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(ausgaben)')}
+        if 'datum_iso' not in columns:
+            conn.execute('ALTER TABLE ausgaben ADD COLUMN datum_iso TEXT')
+        fill_datum_iso(conn)
+        # Laden/Löschen per abrechnung_id, sortiert nach Kategorie und Datum
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS ix_ausgaben_aid_kat_date
+            ON ausgaben (abrechnung_id, kategorie, datum_iso)
+        ''')
         conn.execute('''
             CREATE TABLE IF NOT EXISTS einstellungen (
                 id INTEGER PRIMARY KEY CHECK (id = 1),
@@ -240,7 +440,28 @@ def init_db():
         ''')
         conn.commit()
 
-init_db()
+def fill_datum_iso(conn):
+    """Trägt datum_iso für Zeilen nach, die ohne die Spalte geschrieben wurden (Migration, ältere cli.py)."""
+    rows = conn.execute('SELECT id, daten FROM ausgaben WHERE datum_iso IS NULL').fetchall()
+    if rows:
+        conn.executemany(
+            'UPDATE ausgaben SET datum_iso=? WHERE id=?',
+            [(get_datum_iso(json_loads(row['daten']).get('datum')), row['id']) for row in rows]
+        )
+
+_db_initialized = False
+_db_init_lock = threading.Lock()
+
+@app.before_request
+def ensure_db():
+    """Legt das Schema einmal pro Prozess an - beim ersten Request statt beim Import."""
+    global _db_initialized
+    if not _db_initialized:
+        # Mehrere Threads pro Worker (gthread): Migrationen nur einmal ausführen
+        with _db_init_lock:
+            if not _db_initialized:
+                init_db()
+                _db_initialized = True
 
 # Verpflegungspauschalen 2025
 VERPFLEGUNGSPAUSCHALEN = {
@@ -306,24 +527,20 @@ def health():
 def get_verpflegungspauschalen():
     return jsonify(VERPFLEGUNGSPAUSCHALEN)
 
-# Claude API Client
+# Claude API Client (einmal pro Prozess, damit HTTP-Verbindungen wiederverwendet werden)
+_anthropic_client = None
+
 def get_anthropic_client():
+    global _anthropic_client
     api_key = os.getenv('ANTHROPIC_API_KEY')
-    print(f"[DEBUG] API Key vorhanden: {bool(api_key)}, Länge: {len(api_key) if api_key else 0}")
     if not api_key:
         return None
-    return anthropic.Anthropic(api_key=api_key)
+    if _anthropic_client is None or _anthropic_client.api_key != api_key:
+        _anthropic_client = anthropic.Anthropic(api_key=api_key, max_retries=2, timeout=60.0)
+    return _anthropic_client
 
-# Beleg-Parser mit Claude AI
-def extract_receipt_data_with_ai(text, image_base64=None):
-    """Extrahiert Daten aus Beleg mit Claude AI"""
-    client = get_anthropic_client()
-
-    if not client:
-        # Fallback auf einfache Regex wenn kein API Key
-        return extract_receipt_data_fallback(text)
-
-    prompt = """Analysiere diesen Beleg/Quittung und extrahiere die folgenden Informationen.
+# Anweisungen für die Beleg-Analyse (System-Prompt, für alle Belege gleich)
+RECEIPT_PROMPT = """Analysiere diesen Beleg/Quittung und extrahiere die folgenden Informationen.
 Antworte NUR mit einem JSON-Objekt, ohne zusätzlichen Text.
 
 Kategorien zur Auswahl:
@@ -353,16 +570,27 @@ Wichtig:
 - Bei handschriftlichen Beträgen: bestmöglich interpretieren
 - Bei Bewirtung: Restaurant-Name als Beschreibung
 - Bei unleserlichen Werten: null verwenden
-
-Beleg-Text:
 """
 
+# Beleg-Parser mit Claude AI
+def extract_receipt_data_with_ai(text, image_base64=None):
+    """Extrahiert Daten aus Beleg mit Claude AI"""
+    client = get_anthropic_client()
+
+    if not client:
+        # Fallback auf einfache Regex wenn kein API Key
+        return extract_receipt_data_fallback(text)
+
+    # Statischer Prompt als System-Block mit Prompt-Caching, nur der Beleg wechselt
+    system = [{"type": "text", "text": RECEIPT_PROMPT, "cache_control": {"type": "ephemeral"}}]
+
     try:
         # Wenn wir ein Bild haben, nutze Vision
         if image_base64:
             message = client.messages.create(
                 model="claude-sonnet-4-20250514",
-                max_tokens=1024,
+                max_tokens=400,
+                system=system,
                 messages=[
                     {
                         "role": "user",
@@ -377,7 +605,7 @@ Beleg-Text:
                             },
                             {
                                 "type": "text",
-                                "text": prompt + text
+                                "text": "Beleg-Text:\n" + text
                             }
                         ]
                     }
@@ -386,11 +614,12 @@ Beleg-Text:
         else:
             message = client.messages.create(
                 model="claude-sonnet-4-20250514",
-                max_tokens=1024,
+                max_tokens=400,
+                system=system,
                 messages=[
                     {
                         "role": "user",
-                        "content": prompt + text
+                        "content": "Beleg-Text:\n" + text
                     }
                 ]
             )
@@ -405,7 +634,7 @@ Beleg-Text:
                 response_text = response_text[4:]
         response_text = response_text.strip()
 
-        data = json.loads(response_text)
+        data = json_loads(response_text)
 
         return {
             'datum': data.get('datum'),
@@ -447,6 +676,24 @@ def extract_receipt_data_fallback(text):
 
     return result
 
+def ocr_images(images):
+    """Führt OCR auf allen Seiten/Bildern durch und gibt den gesamten Text zurück."""
+    full_text = ""
+    for img in images:
+        # Bild für OCR optimieren: erst Graustufen (1 statt 3 Kanäle), dann skalieren
+        img_gray = img.convert('L')
+        width, height = img_gray.size
+        if width < 2000:
+            scale = 2000 / width
+            img_gray = img_gray.resize((int(width * scale), int(height * scale)), Image.LANCZOS)
+
+        # OCR
+        custom_config = r'--oem 3 --psm 3'
+        text = pytesseract.image_to_string(img_gray, lang='deu+eng', config=custom_config)
+        full_text += text + "\n"
+
+    return full_text.strip()
+
 @app.route('/api/parse-beleg', methods=['POST'])
 def parse_beleg():
     """Parst einen hochgeladenen Beleg (Bild oder PDF) mit Claude AI"""
@@ -478,56 +725,45 @@ def parse_beleg():
                 'data': cached_data
             })
 
-        images = []
-        first_image_base64 = None
-
-        if filename.endswith('.pdf'):
+        is_pdf = filename.endswith('.pdf')
+        if is_pdf:
             if not PDF_SUPPORT:
                 return jsonify({'error': 'PDF-Support nicht verfügbar. Bitte poppler installieren.'}), 400
-            # PDF zu Bildern konvertieren
-            images = convert_from_bytes(file_content, dpi=300)
+            # Für Claude Vision reicht zunächst die erste Seite
+            images = convert_from_bytes(file_content, dpi=300, first_page=1, last_page=1)
         elif filename.endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif')):
             # Bild direkt laden
             images = [Image.open(io.BytesIO(file_content))]
         else:
             return jsonify({'error': 'Nicht unterstütztes Dateiformat. Erlaubt: PDF, PNG, JPG, TIFF'}), 400
 
-        # OCR auf allen Seiten/Bildern durchführen
-        full_text = ""
-        for idx, img in enumerate(images):
-            # Original für AI-Vision speichern (erstes Bild)
-            if idx == 0:
-                # Bild für Claude vorbereiten (max 1568px, als JPEG)
-                img_for_ai = img.copy()
-                img_for_ai.thumbnail((1568, 1568), Image.LANCZOS)
-                if img_for_ai.mode in ('RGBA', 'P'):
-                    img_for_ai = img_for_ai.convert('RGB')
-                buffer = io.BytesIO()
-                img_for_ai.save(buffer, format='JPEG', quality=85)
-                first_image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-
-            # Bild für OCR optimieren
-            width, height = img.size
-            if width < 2000:
-                scale = 2000 / width
-                img = img.resize((int(width * scale), int(height * scale)), Image.LANCZOS)
-
-            # Graustufen
-            img_gray = img.convert('L')
-
-            # OCR
-            custom_config = r'--oem 3 --psm 3'
-            text = pytesseract.image_to_string(img_gray, lang='deu+eng', config=custom_config)
-            full_text += text + "\n"
-
-        full_text = full_text.strip()
-
-        # Daten mit Claude AI extrahieren (mit Bild für bessere Erkennung)
-        extracted = extract_receipt_data_with_ai(full_text, first_image_base64)
+        # Erstes Bild für Claude vorbereiten (max 1568px, als JPEG)
+        img_for_ai = images[0].copy()
+        img_for_ai.thumbnail((1568, 1568), Image.LANCZOS)
+        if img_for_ai.mode in ('RGBA', 'P'):
+            img_for_ai = img_for_ai.convert('RGB')
+        buffer = io.BytesIO()
+        img_for_ai.save(buffer, format='JPEG', quality=85)
+        first_image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+        # Zuerst nur Claude Vision - OCR wird meist nicht gebraucht
+        extracted = None
+        if get_anthropic_client():
+            extracted = extract_receipt_data_with_ai('', first_image_base64)
+
+        # Fallback: OCR auf allen Seiten, wenn Datum oder Betrag fehlen (oder kein API Key)
+        if not extracted or extracted.get('datum') is None or extracted.get('betrag') is None:
+            if is_pdf:
+                images = convert_from_bytes(file_content, dpi=300)
+            full_text = ocr_images(images)
+
+            # Erneut extrahieren (mit Bild für bessere Erkennung) - mit Claude nur, wenn die OCR
+            # tatsächlich Text geliefert hat; ohne API Key greift der Regex-Fallback
+            if full_text or not extracted:
+                extracted = extract_receipt_data_with_ai(full_text, first_image_base64)
 
         # In Cache speichern
-        cache[content_hash] = extracted
-        save_cache(cache)
+        update_cache(content_hash, extracted)
 
         return jsonify({
             'success': True,
@@ -650,6 +886,12 @@ def delete_person(person_id):
         conn.commit()
         return jsonify({'success': True})
 
+# vCard-Felder (eine Zeile pro Feld, optional mit Parametern wie ;CHARSET=UTF-8)
+VCF_FN_RE = re.compile(r'^[ \t]*FN(?:;[^:\r\n]*)?:(.*)$', re.MULTILINE)
+VCF_N_RE = re.compile(r'^[ \t]*N(?:;[^:\r\n]*)?:(.*)$', re.MULTILINE)
+VCF_ORG_RE = re.compile(r'^[ \t]*ORG(?:;[^:\r\n]*)?:(.*)$', re.MULTILINE)
+VCF_TITLE_RE = re.compile(r'^[ \t]*TITLE(?:;[^:\r\n]*)?:(.*)$', re.MULTILINE)
+
 @app.route('/api/personen/import-vcf', methods=['POST'])
 def import_vcf():
     """Importiert Personen aus VCF-Datei."""
@@ -677,30 +919,30 @@ def import_vcf():
             name = None
             firma = None
 
-            # Parse vCard Felder
-            for line in vcard.split('\n'):
-                line = line.strip()
-
-                # Name aus FN (Formatted Name) oder N
-                if line.startswith('FN:') or line.startswith('FN;'):
-                    # FN kann encoding haben: FN;CHARSET=UTF-8:Name
-                    name = line.split(':', 1)[-1].strip()
-                elif line.startswith('N:') or line.startswith('N;'):
-                    # N Format: Nachname;Vorname;...
-                    n_parts = line.split(':', 1)[-1].split(';')
+            # Name aus FN (Formatted Name), FN kann encoding haben: FN;CHARSET=UTF-8:Name
+            fn_match = VCF_FN_RE.search(vcard)
+            if fn_match:
+                name = fn_match.group(1).strip()
+
+            # Fallback auf N, Format: Nachname;Vorname;...
+            if not name:
+                n_match = VCF_N_RE.search(vcard)
+                if n_match:
+                    n_parts = n_match.group(1).split(';')
                     if len(n_parts) >= 2:
                         nachname = n_parts[0].strip()
                         vorname = n_parts[1].strip()
-                        if not name and (nachname or vorname):
+                        if nachname or vorname:
                             name = f"{vorname} {nachname}".strip()
 
-                # Organisation
-                if line.startswith('ORG:') or line.startswith('ORG;'):
-                    firma = line.split(':', 1)[-1].split(';')[0].strip()
-
-                # Titel als Alternative für Firma
-                if not firma and (line.startswith('TITLE:') or line.startswith('TITLE;')):
-                    firma = line.split(':', 1)[-1].strip()
+            # Organisation, Titel als Alternative für Firma
+            org_match = VCF_ORG_RE.search(vcard)
+            if org_match:
+                firma = org_match.group(1).split(';')[0].strip()
+            if not firma:
+                title_match = VCF_TITLE_RE.search(vcard)
+                if title_match:
+                    firma = title_match.group(1).strip()
 
             if name:
                 imported.append({'name': name, 'firma': firma or ''})
@@ -708,20 +950,21 @@ def import_vcf():
                 skipped += 1
 
         # In Datenbank speichern (Duplikate vermeiden)
-        added = 0
         with get_db() as conn:
             existing = {row['name'].lower() for row in conn.execute('SELECT name FROM personen').fetchall()}
 
+            new_rows = []
             for person in imported:
                 if person['name'].lower() not in existing:
-                    conn.execute('INSERT INTO personen (name, firma) VALUES (?, ?)',
-                               (person['name'], person['firma']))
+                    new_rows.append((person['name'], person['firma']))
                     existing.add(person['name'].lower())
-                    added += 1
                 else:
                     skipped += 1
 
+            # Alle neuen Personen in einem Statement einfügen
+            conn.executemany('INSERT INTO personen (name, firma) VALUES (?, ?)', new_rows)
             conn.commit()
+            added = len(new_rows)
 
         return jsonify({
             'success': True,
@@ -733,6 +976,44 @@ def import_vcf():
     except Exception as e:
         return jsonify({'error': f'Fehler beim Parsen: {str(e)}'}), 400
 
+# Bekannte Beleg-Ordner (aus docker-compose)
+BELEG_SEARCH_DIRS = [
+    '/data/belege',
+    '/data/uber',
+    os.path.expanduser('~/Documents/Scans'),
+    os.path.expanduser('~/Desktop/Belege'),
+    os.path.join(os.path.dirname(__file__), 'belege', 'archiv')
+]
+
+# Index Dateiname -> Pfad über alle Beleg-Ordner (wird bei Bedarf aufgebaut)
+_beleg_file_index = None
+
+
+def build_beleg_file_index():
+    """Durchsucht die Beleg-Ordner einmal und gibt {dateiname: pfad} zurück."""
+    index = {}
+    for search_dir in BELEG_SEARCH_DIRS:
+        for root, dirs, files in os.walk(search_dir):
+            for name in files:
+                # Erster Treffer gewinnt (Reihenfolge der Ordner)
+                index.setdefault(name, os.path.join(root, name))
+    return index
+
+
+def find_beleg_file(datei_name):
+    """Sucht eine Beleg-Datei per Dateiname über den Index der Beleg-Ordner."""
+    global _beleg_file_index
+
+    if _beleg_file_index is not None:
+        datei_pfad = _beleg_file_index.get(datei_name)
+        if datei_pfad and os.path.exists(datei_pfad):
+            return datei_pfad
+
+    # Index fehlt oder ist veraltet (Datei neu/verschoben) - neu aufbauen
+    _beleg_file_index = build_beleg_file_index()
+    return _beleg_file_index.get(datei_name)
+
+
 # API: Beleg per Hash abrufen
 @app.route('/api/beleg/<file_hash>', methods=['GET'])
 def get_beleg(file_hash):
@@ -741,10 +1022,7 @@ def get_beleg(file_hash):
     from flask import send_file
 
     # Cache laden
-    cache = {}
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'r') as f:
-            cache = json.load(f)
+    cache = load_cache()
 
     if file_hash not in cache:
         return jsonify({'error': 'Beleg nicht im Cache gefunden'}), 404
@@ -753,25 +1031,11 @@ def get_beleg(file_hash):
     datei_pfad = cache_entry.get('datei_pfad')
 
     if not datei_pfad or not os.path.exists(datei_pfad):
-        # Fallback: Dateiname in bekannten Ordnern suchen
+        # Fallback: Dateiname in bekannten Ordnern suchen (nur im Speicher über den
+        # Datei-Index, ein lesender Endpoint schreibt den Cache nicht)
         datei_name = cache_entry.get('datei')
         if datei_name:
-            # Bekannte Beleg-Ordner (aus docker-compose)
-            search_dirs = [
-                '/data/belege',
-                '/data/uber',
-                os.path.expanduser('~/Documents/Scans'),
-                os.path.expanduser('~/Desktop/Belege'),
-                os.path.join(os.path.dirname(__file__), 'belege', 'archiv')
-            ]
-            for search_dir in search_dirs:
-                if os.path.exists(search_dir):
-                    for root, dirs, files in os.walk(search_dir):
-                        if datei_name in files:
-                            datei_pfad = os.path.join(root, datei_name)
-                            break
-                    if datei_pfad and os.path.exists(datei_pfad):
-                        break
+            datei_pfad = find_beleg_file(datei_name)
 
     if not datei_pfad or not os.path.exists(datei_pfad):
         return jsonify({'error': 'Beleg-Datei nicht gefunden', 'datei': cache_entry.get('datei')}), 404
@@ -796,10 +1060,7 @@ def get_beleg(file_hash):
 def get_beleg_info(file_hash):
     """Gibt die Cache-Informationen zum Beleg zurück."""
     # Cache laden
-    cache = {}
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'r') as f:
-            cache = json.load(f)
+    cache = load_cache()
 
     if file_hash not in cache:
         return jsonify({'error': 'Beleg nicht im Cache gefunden'}), 404
@@ -825,18 +1086,16 @@ def get_abrechnung(abrechnung_id):
         if not abr:
             return jsonify({'error': 'Nicht gefunden'}), 404
 
-        ausgaben_rows = conn.execute(
-            'SELECT kategorie, daten FROM ausgaben WHERE abrechnung_id = ?', (abrechnung_id,)
-        ).fetchall()
+        # Sortierung nach Datum (bei gleichem Datum in Einfügereihenfolge) direkt in SQLite
+        ausgaben_rows = conn.execute('''
+            SELECT kategorie, daten FROM ausgaben WHERE abrechnung_id = ?
+            ORDER BY kategorie, datum_iso, id
+        ''', (abrechnung_id,)).fetchall()
 
         expenses = {cat: [] for cat in CATEGORIES.keys()}
         for row in ausgaben_rows:
             if row['kategorie'] in expenses:
-                expenses[row['kategorie']].append(json.loads(row['daten']))
-
-        # Jede Kategorie nach Datum sortieren
-        for cat in expenses:
-            expenses[cat] = sort_expenses_by_date(expenses[cat])
+                expenses[row['kategorie']].append(json_loads(row['daten']))
 
         return jsonify({
             'meta': {
@@ -858,6 +1117,10 @@ def save_abrechnung():
     expenses = data.get('expenses', {})
 
     with get_db() as conn:
+        # Schreibsperre sofort holen: alle Statements laufen in einer Transaktion
+        # (ein fsync beim Commit, kein SQLITE_BUSY mitten im Speichern)
+        conn.execute('BEGIN IMMEDIATE')
+
         # Prüfen ob Abrechnung existiert (per ID oder Name+Monat)
         abrechnung_id = meta.get('id')
 
@@ -890,15 +1153,20 @@ def save_abrechnung():
                       meta.get('konto'), meta.get('blz')))
                 abrechnung_id = cursor.lastrowid
 
-        # Alte Ausgaben löschen und neue einfügen
-        conn.execute('DELETE FROM ausgaben WHERE abrechnung_id = ?', (abrechnung_id,))
-
-        for kategorie, items in expenses.items():
-            for item in items:
-                conn.execute('''
-                    INSERT INTO ausgaben (abrechnung_id, kategorie, daten)
-                    VALUES (?, ?, ?)
-                ''', (abrechnung_id, kategorie, json.dumps(item)))
+        # Alte Ausgaben löschen und neue einfügen - nur wenn sie sich von den gespeicherten
+        # Zeilen unterscheiden (Vergleich mit der Tabelle, da auch cli.py und
+        # migrate_file_hash.py in ausgaben schreiben)
+        rows = [(abrechnung_id, kategorie, json_dumps(item), get_datum_iso(item.get('datum')))
+                for kategorie, items in expenses.items() for item in items]
+        stored = conn.execute(
+            'SELECT kategorie, daten FROM ausgaben WHERE abrechnung_id = ? ORDER BY id', (abrechnung_id,)
+        ).fetchall()
+        if [tuple(row) for row in stored] != [row[1:3] for row in rows]:
+            conn.execute('DELETE FROM ausgaben WHERE abrechnung_id = ?', (abrechnung_id,))
+            conn.executemany('''
+                INSERT INTO ausgaben (abrechnung_id, kategorie, daten, datum_iso)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
 
         conn.commit()
         return jsonify({'success': True, 'id': abrechnung_id})
@@ -907,142 +1175,275 @@ def save_abrechnung():
 @app.route('/api/abrechnungen/<int:abrechnung_id>', methods=['DELETE'])
 def delete_abrechnung(abrechnung_id):
     with get_db() as conn:
+        conn.execute('BEGIN IMMEDIATE')
         conn.execute('DELETE FROM ausgaben WHERE abrechnung_id = ?', (abrechnung_id,))
         conn.execute('DELETE FROM abrechnungen WHERE id = ?', (abrechnung_id,))
         conn.commit()
         return jsonify({'success': True})
 
-@app.route('/export/excel', methods=['POST'])
-def export_excel():
-    data = request.json
-    meta = data.get('meta', {})
-    expenses = data.get('expenses', {})
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = meta.get('monat', 'Spesen')
-    
-    # Styles
-    header_font = Font(bold=True, color='FFFFFF')
-    header_fill = PatternFill('solid', fgColor='333333')
-    title_font = Font(color='333333', size=14, bold=True)
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
+# Export-Styles: einmal beim Import erzeugen und in allen Requests wiederverwenden
+# Excel
+HEADER_FONT = Font(bold=True, color='FFFFFF')
+HEADER_FILL = PatternFill('solid', fgColor='333333')
+TITLE_FONT = Font(color='333333', size=14, bold=True)
+SUMMEN_FONT = Font(size=14, bold=True)
+BOLD_FONT = Font(bold=True)
+TOTAL_FONT = Font(size=12, bold=True)
+BANK_FONT = Font(color='333333')
+EURO_FORMAT = '#,##0.00 €'
+
+# PDF (Spesenabrechnung)
+PDF_STYLES = getSampleStyleSheet()
+PDF_TITLE_STYLE = ParagraphStyle('Title', parent=PDF_STYLES['Heading1'], fontSize=16,
+                                 textColor=colors.HexColor('#333333'), spaceAfter=20)
+PDF_ABBR_STYLE = ParagraphStyle('Abbr', parent=PDF_STYLES['Normal'], fontSize=8, textColor=colors.grey)
+CATEGORY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#333333')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('ALIGN', (-1, 1), (-1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+])
+TOTAL_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#333333')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 14),
+    ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+])
+
+# PDF (Bewirtungsbeleg)
+BEW_TITLE_STYLE = ParagraphStyle('Title', parent=PDF_STYLES['Heading1'], fontSize=18,
+                                 textColor=colors.HexColor('#333333'), spaceAfter=15, alignment=1)
+BEW_SUBTITLE_STYLE = ParagraphStyle('Subtitle', parent=PDF_STYLES['Normal'], fontSize=10,
+                                    textColor=colors.grey, spaceAfter=20, alignment=1)
+BEW_LABEL_STYLE = ParagraphStyle('Label', parent=PDF_STYLES['Normal'], fontSize=10,
+                                 textColor=colors.grey)
+BEW_HINWEIS_STYLE = ParagraphStyle('Hinweis', parent=PDF_STYLES['Normal'], fontSize=8,
+                                   textColor=colors.grey, alignment=1)
+BEW_MAIN_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('LINEBELOW', (1, 0), (1, -1), 0.5, colors.lightgrey),
+])
+BEW_TEILNEHMER_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f5f5f5')),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('LEFTPADDING', (0, 0), (-1, -1), 5),
+    ('MINROWHEIGHT', (0, 1), (-1, -1), 10*mm),
+])
+BEW_ANLASS_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('LINEBELOW', (1, 0), (1, -1), 0.5, colors.lightgrey),
+    ('MINROWHEIGHT', (0, 0), (-1, -1), 12*mm),
+])
+BEW_BETRAG_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('FONTSIZE', (1, 0), (1, -1), 14),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica-Bold'),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+])
+BEW_SIG_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 1), (0, 1), colors.grey),
+    ('FONTSIZE', (1, 1), (1, 1), 11),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
+    ('LINEABOVE', (0, 1), (0, 1), 0.5, colors.black),
+    ('LINEABOVE', (1, 1), (1, 1), 0.5, colors.black),
+    ('TOPPADDING', (0, 1), (-1, 1), 5),
+    ('MINROWHEIGHT', (0, 0), (-1, 0), 15*mm),
+])
+
+# LRU-Cache für generierte Exporte (Excel/PDF), Schlüssel = Hash über Art + Daten
+EXPORT_CACHE_SIZE = 64
+_export_cache = OrderedDict()
+_export_cache_lock = threading.Lock()
+
+
+def cached_export(kind, meta, expenses, generate):
+    """Liefert die Bytes eines Exports aus dem Cache oder erzeugt sie mit generate(meta, expenses)."""
+    # Das heutige Datum gehört zum Schlüssel, da es ohne meta['datum'] im Export landet
+    payload = json.dumps({'kind': kind, 'meta': meta, 'expenses': expenses,
+                          'heute': datetime.now().strftime('%d.%m.%Y')},
+                         sort_keys=True, default=str)
+    key = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    with _export_cache_lock:
+        data = _export_cache.get(key)
+        if data is not None:
+            _export_cache.move_to_end(key)
+            return data
+
+    data = generate(meta, expenses).getvalue()
+
+    with _export_cache_lock:
+        _export_cache[key] = data
+        _export_cache.move_to_end(key)
+        while len(_export_cache) > EXPORT_CACHE_SIZE:
+            _export_cache.popitem(last=False)
+    return data
+
+
+def send_export(output, mimetype, download_name):
+    """Sendet einen Export-Buffer als Download mit Content-Length (Größe des Buffers)."""
+    output.seek(0)
+    response = send_file(output, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                         etag=False, max_age=0)
+    response.content_length = output.getbuffer().nbytes
+    return response
+
+
+def styled_cell(ws, value, font=None, fill=None, number_format=None):
+    """Erzeugt eine formatierte Zelle für Worksheets im write_only-Modus."""
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if number_format is not None:
+        cell.number_format = number_format
+    return cell
+
+def generate_excel_buffer(meta, expenses):
+    """Generiert einen Excel-Buffer für die Spesenabrechnung."""
+
+    # write_only: Zeilen werden direkt serialisiert statt als Zellobjekte im Speicher gehalten
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=meta.get('monat', 'Spesen'))
+
+    # Column widths (müssen im write_only-Modus vor der ersten Zeile gesetzt werden)
+    widths = [25, 12, 20, 30, 8, 8, 12, 12]
+    for i, w in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = w
+
     # Header
-    ws['A1'] = meta.get('monat', '')
-    ws['A1'].font = title_font
-    ws['C1'] = meta.get('name', 'Olivier Dobberkau')
-    ws['C1'].font = title_font
-    ws['F1'] = f"Datum {meta.get('datum', datetime.now().strftime('%d.%m.%y'))}"
-    ws['F1'].font = title_font
-    ws['H1'] = 'Summen'
-    ws['H1'].font = Font(size=14, bold=True)
-    
-    row = 3
+    ws.append([
+        styled_cell(ws, meta.get('monat', ''), font=TITLE_FONT),
+        None,
+        styled_cell(ws, meta.get('name', 'Olivier Dobberkau'), font=TITLE_FONT),
+        None,
+        None,
+        styled_cell(ws, f"Datum {meta.get('datum', datetime.now().strftime('%d.%m.%y'))}", font=TITLE_FONT),
+        None,
+        styled_cell(ws, 'Summen', font=SUMMEN_FONT),
+    ])
+    ws.append([])
+
     gesamt = 0
     beleg_nr = 1  # Fortlaufende Belegnummer
 
-    for cat_key, cat_info in CATEGORIES.items():
+    for cat_num, (cat_key, cat_info) in enumerate(CATEGORIES.items(), start=1):
         cat_expenses = expenses.get(cat_key, [])
         # Nach Datum sortieren
         cat_expenses = sort_expenses_by_date(cat_expenses)
         cat_sum = 0
 
         # Category header
-        ws.cell(row=row, column=1, value=f"{list(CATEGORIES.keys()).index(cat_key) + 1}. {cat_info['name']}")
-        ws.cell(row=row, column=1).fill = header_fill
-        ws.cell(row=row, column=1).font = header_font
-
+        header_row = [styled_cell(ws, f"{cat_num}. {cat_info['name']}",
+                                  font=HEADER_FONT, fill=HEADER_FILL)]
         if cat_key == 'fahrtkosten_kfz':
             headers = ['Nr.', 'Datum', 'Fahrstrecke', 'Anlaß', 'km', '0,3', 'Betrag €']
-            for i, h in enumerate(headers, 2):
-                ws.cell(row=row, column=i, value=h)
-                ws.cell(row=row, column=i).fill = header_fill
-                ws.cell(row=row, column=i).font = header_font
-
-        row += 1
-        start_row = row
+            header_row += [styled_cell(ws, h, font=HEADER_FONT, fill=HEADER_FILL) for h in headers]
+        ws.append(header_row)
 
+        lines = []
         for exp in cat_expenses:
+            line = [None] * 8
             # Belegnummer in erste Spalte (außer bei Sonstiges, da steht der Typ)
             if cat_key != 'sonstiges':
-                ws.cell(row=row, column=2, value=beleg_nr)
+                line[1] = beleg_nr
 
             if cat_key == 'fahrtkosten_kfz':
-                ws.cell(row=row, column=3, value=exp.get('datum', ''))
-                ws.cell(row=row, column=4, value=exp.get('fahrstrecke', ''))
-                ws.cell(row=row, column=5, value=exp.get('anlass', ''))
-                km = float(exp.get('km', 0) or 0)
-                ws.cell(row=row, column=6, value=km)
+                line[2] = exp.get('datum', '')
+                line[3] = exp.get('fahrstrecke', '')
+                line[4] = exp.get('anlass', '')
+                km = parse_betrag(exp.get('km'))
+                line[5] = km
                 betrag = km * 0.30
-                ws.cell(row=row, column=8, value=betrag)
+                line[7] = betrag
                 cat_sum += betrag
             elif cat_key == 'sonstiges':
-                ws.cell(row=row, column=1, value=f"{beleg_nr}. {exp.get('typ', '')}")
-                ws.cell(row=row, column=2, value=exp.get('datum', ''))
-                ws.cell(row=row, column=3, value=exp.get('ort', ''))
-                betrag = float(exp.get('betrag', 0) or 0)
-                ws.cell(row=row, column=7, value=betrag)
+                line[0] = f"{beleg_nr}. {exp.get('typ', '')}"
+                line[1] = exp.get('datum', '')
+                line[2] = exp.get('ort', '')
+                betrag = parse_betrag(exp.get('betrag'))
+                line[6] = betrag
                 cat_sum += betrag
             elif cat_key == 'bewirtung':
-                ws.cell(row=row, column=3, value=exp.get('datum', ''))
-                ws.cell(row=row, column=5, value=exp.get('personen', ''))
-                betrag = float(exp.get('betrag', 0) or 0)
-                ws.cell(row=row, column=8, value=betrag)
+                line[2] = exp.get('datum', '')
+                line[4] = exp.get('personen', '')
+                betrag = parse_betrag(exp.get('betrag'))
+                line[7] = betrag
                 cat_sum += betrag
             else:
-                ws.cell(row=row, column=3, value=exp.get('datum', '') or exp.get('monat', ''))
-                ws.cell(row=row, column=4, value=exp.get('beschreibung', ''))
-                betrag = float(exp.get('betrag', 0) or 0)
-                ws.cell(row=row, column=8, value=betrag)
+                line[2] = exp.get('datum', '') or exp.get('monat', '')
+                line[3] = exp.get('beschreibung', '')
+                betrag = parse_betrag(exp.get('betrag'))
+                line[7] = betrag
                 cat_sum += betrag
             beleg_nr += 1
-            row += 1
-        
-        if not cat_expenses:
-            row += 1
-        
-        # Sum for category
-        ws.cell(row=row-1 if cat_expenses else row, column=8, value=cat_sum)
-        ws.cell(row=row-1 if cat_expenses else row, column=8).number_format = '#,##0.00 €'
+            lines.append(line)
+
+        # Sum for category (in der letzten Zeile der Kategorie bzw. nach einer Leerzeile)
+        sum_cell = styled_cell(ws, cat_sum, number_format=EURO_FORMAT)
+        if cat_expenses:
+            lines[-1][7] = sum_cell
+            lines.append([])
+        else:
+            lines = [[], [None] * 7 + [sum_cell]]
+        for line in lines:
+            ws.append(line)
         gesamt += cat_sum
-        row += 1
-    
+
     # Total
-    row += 1
-    ws.cell(row=row, column=7, value='GESAMT')
-    ws.cell(row=row, column=7).font = Font(bold=True)
-    ws.cell(row=row, column=8, value=gesamt)
-    ws.cell(row=row, column=8).font = Font(bold=True)
-    ws.cell(row=row, column=8).number_format = '#,##0.00 €'
-    
+    ws.append([])
+    ws.append([None] * 6 + [
+        styled_cell(ws, 'GESAMT', font=BOLD_FONT),
+        styled_cell(ws, gesamt, font=BOLD_FONT, number_format=EURO_FORMAT),
+    ])
+
     # Bank details
-    row += 2
-    ws.cell(row=row, column=2, value=f"IBAN: {meta.get('iban', '')}")
-    ws.cell(row=row, column=2).font = Font(color='333333')
+    ws.append([])
+    bank_row = [None, styled_cell(ws, f"IBAN: {meta.get('iban', '')}", font=BANK_FONT), None, None, None, None]
     if meta.get('bic'):
-        ws.cell(row=row, column=5, value=f"BIC: {meta.get('bic', '')}")
-        ws.cell(row=row, column=5).font = Font(color='333333')
-    ws.cell(row=row, column=7, value=meta.get('name', ''))
-    ws.cell(row=row, column=7).font = Font(color='333333')
-    
-    # Column widths
-    widths = [25, 12, 20, 30, 8, 8, 12, 12]
-    for i, w in enumerate(widths, 1):
-        ws.column_dimensions[get_column_letter(i)].width = w
-    
+        bank_row[4] = styled_cell(ws, f"BIC: {meta.get('bic', '')}", font=BANK_FONT)
+    bank_row.append(styled_cell(ws, meta.get('name', ''), font=BANK_FONT))
+    ws.append(bank_row)
+
     output = io.BytesIO()
     wb.save(output)
     output.seek(0)
-    
+    return output
+
+
+@app.route('/export/excel', methods=['POST'])
+def export_excel():
+    data = request.json
+    meta = data.get('meta', {})
+    expenses = data.get('expenses', {})
+
+    output = io.BytesIO(cached_export('excel', meta, expenses, generate_excel_buffer))
     filename = f"Spesen_{meta.get('monat', 'Export').replace(' ', '_')}.xlsx"
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                     as_attachment=True, download_name=filename)
+    return send_export(output, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', filename)
 
 def generate_pdf_buffer(meta, expenses):
     """Generiert einen PDF-Buffer für die Spesenabrechnung."""
@@ -1051,16 +1452,12 @@ def generate_pdf_buffer(meta, expenses):
     doc = SimpleDocTemplate(output, pagesize=A4, leftMargin=15*mm, rightMargin=15*mm, 
                            topMargin=15*mm, bottomMargin=15*mm)
     
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=16,
-                                  textColor=colors.HexColor('#333333'), spaceAfter=20)
-    
     elements = []
     
     # Title
     title = f"Spesenabrechnung {meta.get('monat', '')} - {meta.get('name', 'Olivier Dobberkau')}"
-    elements.append(Paragraph(title, title_style))
-    elements.append(Paragraph(f"Datum: {meta.get('datum', datetime.now().strftime('%d.%m.%Y'))}", styles['Normal']))
+    elements.append(Paragraph(title, PDF_TITLE_STYLE))
+    elements.append(Paragraph(f"Datum: {meta.get('datum', datetime.now().strftime('%d.%m.%Y'))}", PDF_STYLES['Normal']))
     elements.append(Spacer(1, 10*mm))
     
     gesamt = 0
@@ -1075,13 +1472,13 @@ def generate_pdf_buffer(meta, expenses):
         cat_expenses = sort_expenses_by_date(cat_expenses)
 
         cat_sum = 0
-        elements.append(Paragraph(cat_info['name'], styles['Heading2']))
+        elements.append(Paragraph(cat_info['name'], PDF_STYLES['Heading2']))
 
         # Build table data with Nr. column
         if cat_key == 'fahrtkosten_kfz':
             table_data = [['Nr.', 'Datum', 'Fahrstrecke', 'Anlaß', 'km', 'Betrag']]
             for exp in cat_expenses:
-                km = float(exp.get('km', 0) or 0)
+                km = parse_betrag(exp.get('km'))
                 betrag = km * 0.30
                 cat_sum += betrag
                 table_data.append([str(beleg_nr), exp.get('datum', ''), exp.get('fahrstrecke', ''),
@@ -1090,7 +1487,7 @@ def generate_pdf_buffer(meta, expenses):
         elif cat_key == 'sonstiges':
             table_data = [['Nr.', 'Typ', 'Datum', 'Ort / Beschreibung', 'Betrag']]
             for exp in cat_expenses:
-                betrag = float(exp.get('betrag', 0) or 0)
+                betrag = parse_betrag(exp.get('betrag'))
                 cat_sum += betrag
 
                 # Typ (Abkürzung für Verpflegungspauschale)
@@ -1109,7 +1506,7 @@ def generate_pdf_buffer(meta, expenses):
         elif cat_key == 'bewirtung':
             table_data = [['Nr.', 'Datum', 'Restaurant', 'Betrag']]
             for exp in cat_expenses:
-                betrag = float(exp.get('betrag', 0) or 0)
+                betrag = parse_betrag(exp.get('betrag'))
                 cat_sum += betrag
                 # Restaurant-Name extrahieren (erster Teil vor " - ")
                 personen = exp.get('personen', '')
@@ -1122,7 +1519,7 @@ def generate_pdf_buffer(meta, expenses):
         else:
             table_data = [['Nr.', 'Datum', 'Beschreibung', 'Betrag']]
             for exp in cat_expenses:
-                betrag = float(exp.get('betrag', 0) or 0)
+                betrag = parse_betrag(exp.get('betrag'))
                 cat_sum += betrag
                 table_data.append([str(beleg_nr), exp.get('datum', '') or exp.get('monat', ''),
                                   exp.get('beschreibung', ''), f"{betrag:.2f} €"])
@@ -1148,16 +1545,7 @@ def generate_pdf_buffer(meta, expenses):
             # Nr., Datum, Beschreibung, Betrag
             col_widths = [12*mm, 22*mm, 121*mm, 25*mm]
         t = Table(table_data, colWidths=col_widths)
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#333333')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('ALIGN', (-1, 1), (-1, -1), 'RIGHT'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ]))
+        t.setStyle(CATEGORY_TABLE_STYLE)
         elements.append(t)
         elements.append(Spacer(1, 5*mm))
         gesamt += cat_sum
@@ -1166,13 +1554,7 @@ def generate_pdf_buffer(meta, expenses):
     elements.append(Spacer(1, 10*mm))
     total_data = [['Gesamtsumme', f"{gesamt:.2f} €"]]
     total_table = Table(total_data, colWidths=[155*mm, 25*mm])
-    total_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#333333')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 14),
-        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
-    ]))
+    total_table.setStyle(TOTAL_TABLE_STYLE)
     elements.append(total_table)
     
     # Bank details
@@ -1183,12 +1565,11 @@ def generate_pdf_buffer(meta, expenses):
             bank_parts.append(f"BIC: {meta.get('bic', '')}")
         bank_parts.append(meta.get('name', ''))
         bank_info = " | ".join(bank_parts)
-        elements.append(Paragraph(bank_info, styles['Normal']))
+        elements.append(Paragraph(bank_info, PDF_STYLES['Normal']))
 
     # Abkürzungsverzeichnis
     elements.append(Spacer(1, 10*mm))
-    abbr_style = ParagraphStyle('Abbr', parent=styles['Normal'], fontSize=8, textColor=colors.grey)
-    elements.append(Paragraph("<b>Abkürzungen:</b> VP = Verpflegungspauschale", abbr_style))
+    elements.append(Paragraph("<b>Abkürzungen:</b> VP = Verpflegungspauschale", PDF_ABBR_STYLE))
 
     doc.build(elements)
     output.seek(0)
@@ -1201,9 +1582,20 @@ def export_pdf():
     meta = data.get('meta', {})
     expenses = data.get('expenses', {})
 
-    output = generate_pdf_buffer(meta, expenses)
+    output = io.BytesIO(cached_export('pdf', meta, expenses, generate_pdf_buffer))
     filename = f"Spesen_{meta.get('monat', 'Export').replace(' ', '_')}.pdf"
-    return send_file(output, mimetype='application/pdf', as_attachment=True, download_name=filename)
+    return send_export(output, 'application/pdf', filename)
+
+
+# Für Dateinamen: Sonderzeichen entfernen, Leerraum durch '_' ersetzen
+FILENAME_STRIP_RE = re.compile(r'[^\w\s-]')
+FILENAME_WS_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=16)
+def decode_signature(unterschrift_base64):
+    """Dekodiert die Unterschrift (Base64) - gecacht, da meist dieselbe Unterschrift für viele Belege kommt."""
+    return base64.b64decode(unterschrift_base64)
 
 
 @app.route('/export/bewirtungsbeleg', methods=['POST'])
@@ -1215,7 +1607,7 @@ def export_bewirtungsbeleg():
     datum = data.get('datum', '')
     restaurant = data.get('restaurant', '')
     ort = data.get('ort', '')
-    betrag = float(data.get('betrag', 0) or 0)
+    betrag = parse_betrag(data.get('betrag'))
     anlass = data.get('anlass', 'Geschäftliche Besprechung')
     bewirtende_person = data.get('bewirtende_person', '')
     teilnehmer = data.get('teilnehmer', [])  # Liste von {name, firma}
@@ -1227,24 +1619,14 @@ def export_bewirtungsbeleg():
     doc = SimpleDocTemplate(output, pagesize=A4, leftMargin=20*mm, rightMargin=20*mm,
                            topMargin=20*mm, bottomMargin=20*mm)
 
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=18,
-                                  textColor=colors.HexColor('#333333'), spaceAfter=15, alignment=1)
-    subtitle_style = ParagraphStyle('Subtitle', parent=styles['Normal'], fontSize=10,
-                                     textColor=colors.grey, spaceAfter=20, alignment=1)
-    label_style = ParagraphStyle('Label', parent=styles['Normal'], fontSize=10,
-                                  textColor=colors.grey)
-    value_style = ParagraphStyle('Value', parent=styles['Normal'], fontSize=12,
-                                  spaceAfter=15)
-
     elements = []
 
     # Titel (mit Belegnummer falls vorhanden)
     if beleg_nr:
-        elements.append(Paragraph(f"Bewirtungsbeleg Nr. {beleg_nr}", title_style))
+        elements.append(Paragraph(f"Bewirtungsbeleg Nr. {beleg_nr}", BEW_TITLE_STYLE))
     else:
-        elements.append(Paragraph("Bewirtungsbeleg", title_style))
-    elements.append(Paragraph("gemäß § 4 Abs. 5 Nr. 2 EStG", subtitle_style))
+        elements.append(Paragraph("Bewirtungsbeleg", BEW_TITLE_STYLE))
+    elements.append(Paragraph("gemäß § 4 Abs. 5 Nr. 2 EStG", BEW_SUBTITLE_STYLE))
     elements.append(Spacer(1, 10*mm))
 
     # Hauptdaten als Tabelle
@@ -1254,19 +1636,12 @@ def export_bewirtungsbeleg():
     ]
 
     main_table = Table(main_data, colWidths=[60*mm, 110*mm])
-    main_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LINEBELOW', (1, 0), (1, -1), 0.5, colors.lightgrey),
-    ]))
+    main_table.setStyle(BEW_MAIN_TABLE_STYLE)
     elements.append(main_table)
     elements.append(Spacer(1, 8*mm))
 
     # Teilnehmer-Tabelle
-    elements.append(Paragraph("Bewirtete Personen:", label_style))
+    elements.append(Paragraph("Bewirtete Personen:", BEW_LABEL_STYLE))
     elements.append(Spacer(1, 3*mm))
 
     if teilnehmer:
@@ -1283,17 +1658,7 @@ def export_bewirtungsbeleg():
             teilnehmer_data.append(['', ''])
 
     teilnehmer_table = Table(teilnehmer_data, colWidths=[85*mm, 85*mm])
-    teilnehmer_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f5f5f5')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 5),
-        ('MINROWHEIGHT', (0, 1), (-1, -1), 10*mm),
-    ]))
+    teilnehmer_table.setStyle(BEW_TEILNEHMER_TABLE_STYLE)
     elements.append(teilnehmer_table)
     elements.append(Spacer(1, 8*mm))
 
@@ -1302,15 +1667,7 @@ def export_bewirtungsbeleg():
         ['Anlass der Bewirtung:', anlass if anlass else ''],
     ]
     anlass_table = Table(anlass_data, colWidths=[60*mm, 110*mm])
-    anlass_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LINEBELOW', (1, 0), (1, -1), 0.5, colors.lightgrey),
-        ('MINROWHEIGHT', (0, 0), (-1, -1), 12*mm),
-    ]))
+    anlass_table.setStyle(BEW_ANLASS_TABLE_STYLE)
     elements.append(anlass_table)
     elements.append(Spacer(1, 8*mm))
 
@@ -1319,15 +1676,7 @@ def export_bewirtungsbeleg():
         ['Höhe der Aufwendungen:', f"{betrag:.2f} €" if betrag else '______________ €'],
     ]
     betrag_table = Table(betrag_data, colWidths=[60*mm, 110*mm])
-    betrag_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('FONTSIZE', (1, 0), (1, -1), 14),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica-Bold'),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-    ]))
+    betrag_table.setStyle(BEW_BETRAG_TABLE_STYLE)
     elements.append(betrag_table)
     elements.append(Spacer(1, 15*mm))
 
@@ -1339,7 +1688,7 @@ def export_bewirtungsbeleg():
             # Base64-Daten dekodieren (entferne data:image/png;base64, Prefix falls vorhanden)
             if ',' in unterschrift_base64:
                 unterschrift_base64 = unterschrift_base64.split(',')[1]
-            img_data = base64.b64decode(unterschrift_base64)
+            img_data = decode_signature(unterschrift_base64)
             sig_buffer = io.BytesIO(img_data)
             sig_image = RLImage(sig_buffer, width=37.5*mm, height=15*mm)  # 75% der Originalgröße
         except Exception as e:
@@ -1360,27 +1709,15 @@ def export_bewirtungsbeleg():
         ]
 
     sig_table = Table(sig_data, colWidths=[85*mm, 85*mm])
-    sig_table.setStyle(TableStyle([
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TEXTCOLOR', (0, 1), (0, 1), colors.grey),
-        ('FONTSIZE', (1, 1), (1, 1), 11),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
-        ('LINEABOVE', (0, 1), (0, 1), 0.5, colors.black),
-        ('LINEABOVE', (1, 1), (1, 1), 0.5, colors.black),
-        ('TOPPADDING', (0, 1), (-1, 1), 5),
-        ('MINROWHEIGHT', (0, 0), (-1, 0), 15*mm),
-    ]))
+    sig_table.setStyle(BEW_SIG_TABLE_STYLE)
     elements.append(sig_table)
 
     # Hinweis
     elements.append(Spacer(1, 15*mm))
-    hinweis_style = ParagraphStyle('Hinweis', parent=styles['Normal'], fontSize=8,
-                                    textColor=colors.grey, alignment=1)
     elements.append(Paragraph(
         "Hinweis: Bitte Originalbeleg anheften. Bei Bewirtungen in Gaststätten ist dieser Beleg "
         "zusammen mit der Rechnung der Gaststätte aufzubewahren.",
-        hinweis_style
+        BEW_HINWEIS_STYLE
     ))
 
     doc.build(elements)
@@ -1398,8 +1735,8 @@ def export_bewirtungsbeleg():
         iso_datum = datum.replace('.', '-')
 
     # Restaurant-Name säubern
-    safe_restaurant = re.sub(r'[^\w\s-]', '', restaurant).strip()
-    safe_restaurant = re.sub(r'\s+', '_', safe_restaurant)[:25]
+    safe_restaurant = FILENAME_STRIP_RE.sub('', restaurant).strip()
+    safe_restaurant = FILENAME_WS_RE.sub('_', safe_restaurant)[:25]
 
     # Dateiname mit Belegnummer falls vorhanden
     if beleg_nr:
@@ -1412,11 +1749,119 @@ def export_bewirtungsbeleg():
 
     # PDF in Ordner speichern
     filepath = os.path.join(bewirtungsbelege_dir, filename)
+    # In Blöcken kopieren statt getvalue(): keine zweite Kopie des PDFs im Speicher
+    output.seek(0)
     with open(filepath, 'wb') as f:
-        f.write(output.getvalue())
+        shutil.copyfileobj(output, f, length=65536)
+
+    return send_export(output, 'application/pdf', filename)
+
+def generate_zip_excel_buffer(meta, expenses):
+    """Generiert den Excel-Buffer für den ZIP-Export (vereinfachtes Layout)."""
+    monat = meta.get('monat', 'Spesen')
+    output = io.BytesIO()
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=monat)
+
+    # Header
+    ws.append([
+        styled_cell(ws, monat, font=TITLE_FONT),
+        None,
+        styled_cell(ws, meta.get('name', ''), font=TITLE_FONT),
+        None,
+        None,
+        f"Datum {meta.get('datum', datetime.now().strftime('%d.%m.%y'))}",
+    ])
+    ws.append([])
+
+    gesamt = 0
+
+    for cat_num, (cat_key, cat_info) in enumerate(CATEGORIES.items(), start=1):
+        cat_expenses = expenses.get(cat_key, [])
+        cat_expenses = sort_expenses_by_date(cat_expenses)
+        cat_sum = 0
+
+        if cat_key == 'fahrtkosten_kfz':
+            headers = ['', 'Datum', 'Fahrstrecke', 'Anlaß', 'km', '0,3', 'Betrag €']
+        else:
+            headers = ['', 'Datum', 'Beschreibung', '', '', '', 'Betrag €']
+
+        header_row = [f"{cat_num}. {cat_info['name']}"] + headers
+        ws.append([styled_cell(ws, h, font=HEADER_FONT, fill=HEADER_FILL) for h in header_row])
+
+        for exp in cat_expenses:
+            if cat_key == 'fahrtkosten_kfz':
+                km = parse_betrag(exp.get('km'))
+                betrag = km * 0.30
+                ws.append([None, exp.get('datum', ''), exp.get('fahrstrecke', ''), exp.get('anlass', ''),
+                           km, '0,30', f"{betrag:.2f}"])
+            else:
+                betrag = parse_betrag(exp.get('betrag'))
+                beschreibung = exp.get('beschreibung', exp.get('personen', exp.get('ort', '')))
+                ws.append([None, exp.get('datum', exp.get('monat', '')), beschreibung,
+                           None, None, None, f"{betrag:.2f}"])
+            cat_sum += betrag
+
+        ws.append([None] * 5 + [
+            styled_cell(ws, "Summe:", font=BOLD_FONT),
+            styled_cell(ws, f"{cat_sum:.2f}", font=BOLD_FONT),
+        ])
+        ws.append([])
+        gesamt += cat_sum
 
+    ws.append([None] * 5 + [
+        styled_cell(ws, "GESAMT:", font=TOTAL_FONT),
+        styled_cell(ws, f"{gesamt:.2f}", font=TOTAL_FONT),
+    ])
+
+    wb.save(output)
     output.seek(0)
-    return send_file(output, mimetype='application/pdf', as_attachment=True, download_name=filename)
+    return output
+
+
+# Dateiendungen, die im ZIP ohne erneute Kompression gespeichert werden
+ZIP_STORED_EXTENSIONS = ('.pdf', '.xlsx', '.jpg', '.jpeg', '.png')
+
+
+def collect_zip_belege(expenses, monat):
+    """Sammelt Original-Belege und Bewirtungsbelege als Liste von (Dateipfad, Name im ZIP)."""
+    files = []
+
+    # Original-Belege (per file_hash) mit fortlaufender Nummerierung
+    cache = load_cache()
+
+    beleg_nr = 1  # Fortlaufende Belegnummer für Dateinamen
+    for cat_key in CATEGORIES.keys():
+        cat_expenses = expenses.get(cat_key, [])
+        # Nach Datum sortieren (gleiche Reihenfolge wie in Excel/PDF)
+        cat_expenses = sort_expenses_by_date(cat_expenses)
+
+        for exp in cat_expenses:
+            file_hash = exp.get('file_hash')
+            if file_hash and file_hash in cache:
+                cache_entry = cache[file_hash]
+                datei_pfad = cache_entry.get('datei_pfad')
+                datei_name = cache_entry.get('datei', f'beleg_{beleg_nr}.pdf')
+
+                if datei_pfad and os.path.exists(datei_pfad):
+                    # Beleg mit Nummer-Präfix
+                    numbered_name = f"{beleg_nr:02d}_{datei_name}"
+                    files.append((datei_pfad, f"Belege/{numbered_name}"))
+
+            beleg_nr += 1  # Nummer erhöhen für jeden Eintrag (auch ohne Beleg)
+
+    # Bewirtungsbelege aus dem Export-Ordner
+    bewirtungsbelege_dir = get_export_dir(monat, subfolder='bewirtungsbelege')
+    try:
+        with os.scandir(bewirtungsbelege_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pdf') and entry.is_file():
+                    files.append((entry.path, f"Bewirtungsbelege/{entry.name}"))
+    except FileNotFoundError:
+        pass
+
+    return files
+
 
 @app.route('/export/zip', methods=['POST'])
 def export_zip():
@@ -1431,135 +1876,34 @@ def export_zip():
     # ZIP-Buffer erstellen
     zip_buffer = io.BytesIO()
 
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        # 1. Excel exportieren
-        excel_buffer = io.BytesIO()
-        wb = Workbook()
-        ws = wb.active
-        ws.title = monat
-
-        # Styles
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill('solid', fgColor='333333')
-        title_font = Font(color='333333', size=14, bold=True)
-
-        # Header
-        ws['A1'] = monat
-        ws['A1'].font = title_font
-        ws['C1'] = meta.get('name', '')
-        ws['C1'].font = title_font
-        ws['F1'] = f"Datum {meta.get('datum', datetime.now().strftime('%d.%m.%y'))}"
-
-        row = 3
-        gesamt = 0
-
-        for cat_key, cat_info in CATEGORIES.items():
-            cat_expenses = expenses.get(cat_key, [])
-            cat_expenses = sort_expenses_by_date(cat_expenses)
-            cat_sum = 0
-
-            ws.cell(row=row, column=1, value=f"{list(CATEGORIES.keys()).index(cat_key) + 1}. {cat_info['name']}")
-            ws.cell(row=row, column=1).fill = header_fill
-            ws.cell(row=row, column=1).font = header_font
-
-            if cat_key == 'fahrtkosten_kfz':
-                headers = ['', 'Datum', 'Fahrstrecke', 'Anlaß', 'km', '0,3', 'Betrag €']
-            else:
-                headers = ['', 'Datum', 'Beschreibung', '', '', '', 'Betrag €']
+    # Excel, PDF und Belegsuche sind unabhängig voneinander und laufen parallel
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        excel_future = executor.submit(cached_export, 'zip-excel', meta, expenses, generate_zip_excel_buffer)
+        pdf_future = executor.submit(cached_export, 'pdf', meta, expenses, generate_pdf_buffer)
+        belege_future = executor.submit(collect_zip_belege, expenses, monat)
 
-            for i, h in enumerate(headers, 2):
-                ws.cell(row=row, column=i, value=h)
-                ws.cell(row=row, column=i).fill = header_fill
-                ws.cell(row=row, column=i).font = header_font
-            row += 1
-
-            for exp in cat_expenses:
-                if cat_key == 'fahrtkosten_kfz':
-                    km = float(exp.get('km', 0) or 0)
-                    betrag = km * 0.30
-                    ws.cell(row=row, column=2, value=exp.get('datum', ''))
-                    ws.cell(row=row, column=3, value=exp.get('fahrstrecke', ''))
-                    ws.cell(row=row, column=4, value=exp.get('anlass', ''))
-                    ws.cell(row=row, column=5, value=km)
-                    ws.cell(row=row, column=6, value='0,30')
-                    ws.cell(row=row, column=7, value=f"{betrag:.2f}")
-                else:
-                    betrag = float(exp.get('betrag', 0) or 0)
-                    ws.cell(row=row, column=2, value=exp.get('datum', exp.get('monat', '')))
-                    beschreibung = exp.get('beschreibung', exp.get('personen', exp.get('ort', '')))
-                    ws.cell(row=row, column=3, value=beschreibung)
-                    ws.cell(row=row, column=7, value=f"{betrag:.2f}")
-                cat_sum += betrag
-                row += 1
-
-            ws.cell(row=row, column=6, value="Summe:")
-            ws.cell(row=row, column=6).font = Font(bold=True)
-            ws.cell(row=row, column=7, value=f"{cat_sum:.2f}")
-            ws.cell(row=row, column=7).font = Font(bold=True)
-            gesamt += cat_sum
-            row += 2
-
-        ws.cell(row=row, column=6, value="GESAMT:")
-        ws.cell(row=row, column=6).font = Font(size=12, bold=True)
-        ws.cell(row=row, column=7, value=f"{gesamt:.2f}")
-        ws.cell(row=row, column=7).font = Font(size=12, bold=True)
-
-        wb.save(excel_buffer)
-        excel_buffer.seek(0)
-        zf.writestr(f"Spesen_{monat.replace(' ', '_')}.xlsx", excel_buffer.getvalue())
+    # Bereits komprimierte Formate unverändert speichern, nur der Rest wird deflated
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        # 1. Excel exportieren (xlsx ist selbst ein ZIP)
+        zf.writestr(f"Spesen_{monat.replace(' ', '_')}.xlsx", excel_future.result(),
+                    compress_type=zipfile.ZIP_STORED)
 
         # 2. PDF-Übersicht hinzufügen
-        pdf_buffer = generate_pdf_buffer(meta, expenses)
-        zf.writestr(f"Spesen_{monat.replace(' ', '_')}.pdf", pdf_buffer.getvalue())
-
-        # 3. Original-Belege sammeln (per file_hash) mit fortlaufender Nummerierung
-        cache = {}
-        if os.path.exists(CACHE_FILE):
-            with open(CACHE_FILE, 'r') as f:
-                cache = json.load(f)
+        zf.writestr(f"Spesen_{monat.replace(' ', '_')}.pdf", pdf_future.result(),
+                    compress_type=zipfile.ZIP_STORED)
 
-        beleg_nr = 1  # Fortlaufende Belegnummer für Dateinamen
-        for cat_key in CATEGORIES.keys():
-            cat_expenses = expenses.get(cat_key, [])
-            # Nach Datum sortieren (gleiche Reihenfolge wie in Excel/PDF)
-            cat_expenses = sort_expenses_by_date(cat_expenses)
-
-            for exp in cat_expenses:
-                file_hash = exp.get('file_hash')
-                if file_hash and file_hash in cache:
-                    cache_entry = cache[file_hash]
-                    datei_pfad = cache_entry.get('datei_pfad')
-                    datei_name = cache_entry.get('datei', f'beleg_{beleg_nr}.pdf')
-
-                    if datei_pfad and os.path.exists(datei_pfad):
-                        # Dateiendung extrahieren
-                        _, ext = os.path.splitext(datei_name)
-                        # Beleg mit Nummer-Präfix ins ZIP hinzufügen
-                        numbered_name = f"{beleg_nr:02d}_{datei_name}"
-                        zf.write(datei_pfad, f"Belege/{numbered_name}")
-
-                beleg_nr += 1  # Nummer erhöhen für jeden Eintrag (auch ohne Beleg)
-
-        # 4. Bewirtungsbelege aus dem Export-Ordner hinzufügen
-        bewirtungsbelege_dir = get_export_dir(monat, subfolder='bewirtungsbelege')
-        if os.path.exists(bewirtungsbelege_dir):
-            for filename in os.listdir(bewirtungsbelege_dir):
-                if filename.endswith('.pdf'):
-                    filepath = os.path.join(bewirtungsbelege_dir, filename)
-                    zf.write(filepath, f"Bewirtungsbelege/{filename}")
-
-    zip_buffer.seek(0)
+        # 3. Original-Belege und 4. Bewirtungsbelege hinzufügen
+        for filepath, arcname in belege_future.result():
+            if arcname.lower().endswith(ZIP_STORED_EXTENSIONS):
+                zf.write(filepath, arcname, compress_type=zipfile.ZIP_STORED)
+            else:
+                zf.write(filepath, arcname)
 
     # Dateiname für ZIP
     safe_monat = monat.replace(' ', '_').replace('/', '-')
     zip_filename = f"Spesen_{safe_monat}_komplett.zip"
 
-    return send_file(
-        zip_buffer,
-        mimetype='application/zip',
-        as_attachment=True,
-        download_name=zip_filename
-    )
+    return send_export(zip_buffer, 'application/zip', zip_filename)
 
 
 if __name__ == '__main__':
@@ -12,10 +12,21 @@ import argparse
 import os
 import sys
 import json
+import re
 import sqlite3
 import hashlib
+import time
+import shutil
+import stat
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
+from types import MappingProxyType
 
 # Imports aus der App
 from dotenv import load_dotenv
@@ -31,32 +42,83 @@ CACHE_FILE = os.path.join(DATA_DIR, '.beleg_cache.json')
 
 
 def get_file_hash(filepath):
-    """Berechnet MD5-Hash einer Datei für Cache-Key"""
-    hasher = hashlib.md5()
+    """
+    Berechnet MD5-Hash einer Datei für Cache-Key.
+    MD5 bleibt, da Web-App (get_content_hash) und gespeicherte file_hash-Werte denselben Schlüssel nutzen.
+    hashlib.file_digest liest ohne Python-Schleife in einen wiederverwendeten Puffer.
+    """
     with open(filepath, 'rb') as f:
-        for chunk in iter(lambda: f.read(65536), b''):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+        return hashlib.file_digest(f, 'md5').hexdigest()
+
+
+def hash_files(paths):
+    """
+    Berechnet die Hashes mehrerer Dateien parallel (hashlib gibt beim Hashen den GIL frei).
+    Gibt ein Dict {Pfad: Hash} in der Reihenfolge von paths zurück.
+    """
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+        return dict(zip(paths, executor.map(get_file_hash, paths)))
+
+
+# Optional: orjson für schnellere JSON-Verarbeitung (Fallback: json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 
 def load_cache():
     """Lädt den Cache aus der JSON-Datei"""
     if os.path.exists(CACHE_FILE):
         try:
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(CACHE_FILE, 'rb') as f:
+                data = f.read()
+            return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
         except (json.JSONDecodeError, IOError):
             return {}
     return {}
 
 
+# umask des Prozesses (os.umask lässt sich nur setzend abfragen)
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def get_cache_file_mode():
+    """Rechte der bestehenden Cache-Datei, sonst 0644 abzüglich umask."""
+    try:
+        return stat.S_IMODE(os.stat(CACHE_FILE).st_mode)
+    except OSError:
+        return 0o644 & ~UMASK
+
+
 def save_cache(cache):
-    """Speichert den Cache in die JSON-Datei"""
+    """
+    Speichert den Cache in die JSON-Datei.
+    Geschrieben wird in eine Temp-Datei im selben Verzeichnis, die per os.replace atomar
+    an die Stelle der alten tritt - Web-App und Skripte sehen nie eine halb geschriebene Datei.
+    """
+    tmp_path = None
     try:
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cache, f, ensure_ascii=False, indent=2)
+        with tempfile.NamedTemporaryFile('wb', dir=DATA_DIR, prefix='.beleg_cache.',
+                                         suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            if ORJSON_AVAILABLE:
+                f.write(orjson.dumps(cache, option=orjson.OPT_INDENT_2))
+            else:
+                f.write(json.dumps(cache, ensure_ascii=False, indent=2).encode('utf-8'))
+        # NamedTemporaryFile legt 0600 an - Web-App (anderer Benutzer im Container) muss lesen können
+        os.chmod(tmp_path, get_cache_file_mode())
+        os.replace(tmp_path, CACHE_FILE)
     except IOError as e:
         print(f"⚠️  Cache konnte nicht gespeichert werden: {e}")
+    finally:
+        # Temp-Datei bei jedem Fehler (auch z.B. TypeError beim Serialisieren) aufräumen
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 from PIL import Image
 import anthropic
@@ -64,6 +126,13 @@ import pytesseract
 import base64
 import io
 
+# Optional: tesserocr (tesseract in-process, spart den Prozessstart pro Bild)
+try:
+    from tesserocr import PyTessBaseAPI, PSM, OEM
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
 # Optional: pdf2image
 try:
     from pdf2image import convert_from_path
@@ -74,6 +143,7 @@ except ImportError:
 
 # Excel/PDF Export
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from reportlab.lib import colors
@@ -94,9 +164,22 @@ except ImportError:
 # Währungsumrechnung
 # ============================================================================
 
+# HTTP-Session für externe Abfragen (Verbindungen werden wiederverwendet)
+_http_session = None
+
+
+def get_http_session():
+    """Gemeinsame requests.Session, beim ersten Gebrauch angelegt"""
+    global _http_session
+    if _http_session is None:
+        _http_session = requests.Session()
+    return _http_session
+
+
 # Fallback-Wechselkurse zu EUR (Stand: Dezember 2024)
 # Diese werden verwendet wenn keine API verfügbar ist
-FALLBACK_EXCHANGE_RATES = {
+# Schreibgeschützt, damit sie ohne Kopie als Session-Kurse dienen können
+FALLBACK_EXCHANGE_RATES = MappingProxyType({
     'EUR': 1.0,
     'USD': 0.95,      # 1 USD = 0.95 EUR
     'GBP': 1.17,      # 1 GBP = 1.17 EUR
@@ -114,41 +197,77 @@ FALLBACK_EXCHANGE_RATES = {
     'CNY': 0.13,      # 1 CNY = 0.13 EUR (China)
     'AUD': 0.61,      # 1 AUD = 0.61 EUR (Australien)
     'CAD': 0.68,      # 1 CAD = 0.68 EUR (Kanada)
-}
+})
+
+# Kurs-Einträge im EZB-XML, direkt auf den Bytes der Antwort gesucht (kein Decode nötig)
+ECB_RATE_RE = re.compile(rb"currency='([A-Z]{3})' rate='(\d+(?:\.\d+)?)'")
 
 # Cache für API-Wechselkurse (wird einmal pro Session geladen)
 _exchange_rates_cache = None
 
+# EZB-Kurse zusätzlich auf Platte, damit nicht jeder CLI-Aufruf die EZB abfragt
+FX_RATES_FILE = os.path.join(DATA_DIR, '.fx_rates.json')
+FX_RATES_TTL = 24 * 60 * 60  # Sekunden
+
+
+def load_fx_rates():
+    """Gespeicherte EZB-Kurse laden, solange sie jünger als FX_RATES_TTL sind"""
+    try:
+        with open(FX_RATES_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if time.time() - cached['fetched_at'] < FX_RATES_TTL:
+            return cached['rates']
+    except (IOError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def save_fx_rates(rates):
+    """EZB-Kurse mit Zeitstempel atomar speichern"""
+    tmp_path = FX_RATES_FILE + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': time.time(), 'rates': rates}, f)
+        os.replace(tmp_path, FX_RATES_FILE)
+    except IOError as e:
+        print(f"⚠️  Wechselkurse konnten nicht gespeichert werden: {e}")
+
 
 def get_exchange_rates():
     """
     Holt aktuelle Wechselkurse von der EZB oder verwendet Fallback.
-    Cached das Ergebnis für die gesamte Session.
+    Cached das Ergebnis für die gesamte Session und EZB-Kurse 24h auf Platte.
     """
     global _exchange_rates_cache
 
     if _exchange_rates_cache is not None:
         return _exchange_rates_cache
 
+    rates = load_fx_rates()
+    if rates:
+        print(f"💱 Gespeicherte EZB-Wechselkurse verwendet ({len(rates)} Währungen)")
+        _exchange_rates_cache = rates
+        return rates
+
     # Versuche EZB-Kurse zu laden (kostenlos, kein API-Key nötig)
     if REQUESTS_AVAILABLE:
         try:
             # EZB Exchange Rates API (XML)
-            response = requests.get(
+            response = get_http_session().get(
                 'https://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml',
-                timeout=5
+                timeout=2
             )
             if response.status_code == 200:
-                import re
                 rates = {'EUR': 1.0}
                 # Parse XML einfach mit Regex (schneller als XML-Parser)
-                for match in re.finditer(r"currency='(\w+)' rate='([\d.]+)'", response.text):
+                for match in ECB_RATE_RE.finditer(response.content):
                     currency, rate = match.groups()
                     # EZB gibt EUR zu Fremdwährung, wir brauchen Fremdwährung zu EUR
-                    rates[currency] = 1.0 / float(rate)
+                    rates[currency.decode('ascii')] = 1.0 / float(rate)
 
                 if len(rates) > 5:  # Sanity check
                     print(f"💱 Aktuelle EZB-Wechselkurse geladen ({len(rates)} Währungen)")
+                    save_fx_rates(rates)
                     _exchange_rates_cache = rates
                     return rates
         except Exception as e:
@@ -156,7 +275,7 @@ def get_exchange_rates():
 
     # Fallback verwenden
     print("💱 Verwende Fallback-Wechselkurse")
-    _exchange_rates_cache = FALLBACK_EXCHANGE_RATES.copy()
+    _exchange_rates_cache = FALLBACK_EXCHANGE_RATES
     return _exchange_rates_cache
 
 
@@ -170,7 +289,15 @@ def convert_to_eur(amount, currency):
     if not currency or currency.upper() == 'EUR':
         return amount, None
 
-    currency = currency.upper()
+    return convert_to_eur_cached(amount, currency.upper())
+
+
+@lru_cache(maxsize=4096)
+def convert_to_eur_cached(amount, currency):
+    """
+    Umrechnung für convert_to_eur, memoisiert je (Betrag, Währung).
+    Gültig, weil get_exchange_rates() die Kurse einmal pro Session festlegt.
+    """
     rates = get_exchange_rates()
 
     if currency in rates:
@@ -188,10 +315,13 @@ def process_currency_conversion(expense_data):
     Verarbeitet einen Expense-Eintrag und konvertiert Fremdwährungen nach EUR.
     Modifiziert das Dict in-place und fügt Original-Währungsinfo zur Beschreibung hinzu.
     """
-    betrag = expense_data.get('betrag', 0)
+    # Häufigster Fall zuerst: Beleg bereits in EUR, nichts umzurechnen
     waehrung = expense_data.get('waehrung', 'EUR')
+    if not waehrung or waehrung.upper() == 'EUR':
+        return expense_data
 
-    if not betrag or not waehrung:
+    betrag = expense_data.get('betrag', 0)
+    if not betrag:
         return expense_data
 
     betrag_eur, original_str = convert_to_eur(float(betrag), waehrung)
@@ -229,6 +359,13 @@ MONAT_KURZ = {
     'sep': 9, 'okt': 10, 'oct': 10, 'nov': 11, 'dez': 12, 'dec': 12
 }
 
+# Alle Kurzformen in einem Muster, längste zuerst (keine Präfix-Kollisionen)
+MONAT_RE = re.compile('|'.join(sorted(MONAT_KURZ, key=len, reverse=True)))
+
+# Jahr bzw. Monat+Jahr ("11/2025", "11-2025", "11.2025") in Monat-Strings
+YEAR_RE = re.compile(r'(20\d{2})')
+MONAT_JAHR_RE = re.compile(r'(\d{1,2})[/\-.]?(20\d{2})')
+
 # Export-Basisverzeichnis
 EXPORTS_DIR = os.environ.get('EXPORTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports'))
 
@@ -245,17 +382,15 @@ def parse_monat_string(monat_str):
     monat_str = monat_str.lower().strip()
 
     # Pattern 1: "Nov 2025" oder "November 2025"
-    for kurz, num in MONAT_KURZ.items():
-        if kurz in monat_str:
-            # Jahr extrahieren
-            import re
-            year_match = re.search(r'(20\d{2})', monat_str)
-            if year_match:
-                return int(year_match.group(1)), num
+    monat_match = MONAT_RE.search(monat_str)
+    if monat_match:
+        # Jahr extrahieren
+        year_match = YEAR_RE.search(monat_str)
+        if year_match:
+            return int(year_match.group(1)), MONAT_KURZ[monat_match.group(0)]
 
     # Pattern 2: "11/2025" oder "11-2025" oder "11.2025"
-    import re
-    match = re.search(r'(\d{1,2})[/\-.]?(20\d{2})', monat_str)
+    match = MONAT_JAHR_RE.search(monat_str)
     if match:
         return int(match.group(2)), int(match.group(1))
 
@@ -264,17 +399,26 @@ def parse_monat_string(monat_str):
     return now.year, now.month
 
 
+# Bereits angelegte Export-/Archiv-Verzeichnisse je Monat-String (makedirs nur einmal pro Lauf)
+_export_dir_cache = {}
+_archiv_dir_cache = {}
+
+
 def get_export_dir(monat_str):
     """
     Erstellt den Export-Pfad im Format: exports/2025/11_November/
     Gibt den Pfad zurück und erstellt das Verzeichnis falls nötig.
     """
+    if monat_str in _export_dir_cache:
+        return _export_dir_cache[monat_str]
+
     year, month = parse_monat_string(monat_str)
     month_name = MONAT_NAMEN.get(month, f'{month:02d}')
 
     export_path = os.path.join(EXPORTS_DIR, str(year), f'{month:02d}_{month_name}')
     os.makedirs(export_path, exist_ok=True)
 
+    _export_dir_cache[monat_str] = export_path
     return export_path
 
 
@@ -287,36 +431,52 @@ def get_archiv_dir(monat_str):
     Erstellt den Archiv-Pfad im Format: belege/archiv/2025/11_November/
     Gibt den Pfad zurück und erstellt das Verzeichnis falls nötig.
     """
+    if monat_str in _archiv_dir_cache:
+        return _archiv_dir_cache[monat_str]
+
     year, month = parse_monat_string(monat_str)
     month_name = MONAT_NAMEN.get(month, f'{month:02d}')
 
     archiv_path = os.path.join(ARCHIV_DIR, str(year), f'{month:02d}_{month_name}')
     os.makedirs(archiv_path, exist_ok=True)
 
+    _archiv_dir_cache[monat_str] = archiv_path
     return archiv_path
 
 
-def archive_file(filepath, monat_str):
+def archive_file(filepath, monat_str, existing=None):
     """
     Verschiebt eine Datei ins Archiv-Verzeichnis.
     Gibt den neuen Pfad zurück oder None bei Fehler.
+    existing: optional Set der Dateinamen im Archiv (einmal per os.listdir gelesen),
+    Namenskonflikte werden dann ohne stat pro Kandidat aufgelöst und das Set fortgeschrieben.
     """
-    import shutil
-
     archiv_dir = get_archiv_dir(monat_str)
     filename = os.path.basename(filepath)
-    target_path = os.path.join(archiv_dir, filename)
+
+    def name_exists(name):
+        if existing is not None:
+            return name in existing
+        return os.path.exists(os.path.join(archiv_dir, name))
 
     # Bei Namenskonflikt: Nummer anhängen
-    if os.path.exists(target_path):
+    target_name = filename
+    if name_exists(target_name):
         stem, suffix = os.path.splitext(filename)
         counter = 1
-        while os.path.exists(target_path):
-            target_path = os.path.join(archiv_dir, f"{stem}_{counter}{suffix}")
+        while name_exists(target_name):
+            target_name = f"{stem}_{counter}{suffix}"
             counter += 1
+    target_path = os.path.join(archiv_dir, target_name)
 
     try:
-        shutil.move(str(filepath), str(target_path))
+        try:
+            # Gleiches Dateisystem: einfaches rename statt Kopieren+Löschen
+            os.rename(filepath, target_path)
+        except OSError:
+            shutil.move(str(filepath), str(target_path))
+        if existing is not None:
+            existing.add(target_name)
         return target_path
     except Exception as e:
         print(f"⚠️  Archivierung fehlgeschlagen für {filename}: {e}")
@@ -335,6 +495,9 @@ CATEGORIES = {
     'sonstiges': 'Sonstiges'
 }
 
+# Nur die Schlüssel, für Zugehörigkeitsprüfungen
+CATEGORY_KEYS = frozenset(CATEGORIES)
+
 
 def get_anthropic_client():
     """Claude API Client erstellen"""
@@ -345,61 +508,158 @@ def get_anthropic_client():
     return anthropic.Anthropic(api_key=api_key)
 
 
-def process_receipt(filepath, client, cache=None, use_cache=True):
-    """Einzelnen Beleg verarbeiten (mit Cache-Support)"""
-    filename = os.path.basename(filepath).lower()
-    images = []
+# Gerasterte PDF-Seiten je Datei-Hash und DPI, damit Wiederholungsläufe Poppler überspringen
+RASTER_CACHE_DIR = os.path.join(DATA_DIR, '.raster_cache')
+PDF_DPI = 200
+RASTER_CACHE_MAX_AGE_DAYS = 30
 
-    # Cache prüfen
-    if use_cache and cache is not None:
-        file_hash = get_file_hash(filepath)
-        if file_hash in cache:
-            cached_data = cache[file_hash]
-            cached_data['datei'] = os.path.basename(filepath)
-            cached_data['_cached'] = True
-            return cached_data, None
 
-    try:
-        if filename.endswith('.pdf'):
-            if not PDF_SUPPORT:
-                return None, "PDF-Support nicht verfügbar"
-            images = convert_from_path(filepath, dpi=300)
-        elif filename.endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif')):
-            images = [Image.open(filepath)]
-        else:
-            return None, "Nicht unterstütztes Format"
+def rasterize_pdf_cached(pdf_path, file_hash=None, dpi=PDF_DPI):
+    """PDF-Seiten als Bilder liefern, aus dem Raster-Cache oder frisch per Poppler gerendert"""
+    if file_hash is None:
+        file_hash = get_file_hash(pdf_path)
+    cache_dir = os.path.join(RASTER_CACHE_DIR, f"{file_hash}_{dpi}")
 
-        # OCR und Bild für AI vorbereiten
-        full_text = ""
-        first_image_base64 = None
+    if not os.path.isdir(cache_dir):
+        os.makedirs(RASTER_CACHE_DIR, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=RASTER_CACHE_DIR, prefix='.tmp_')
+        try:
+            convert_from_path(pdf_path, dpi=dpi, fmt='png', output_folder=tmp_dir,
+                              output_file='page', paths_only=True,
+                              thread_count=os.cpu_count() or 1)
+            try:
+                os.rename(tmp_dir, cache_dir)
+            except OSError:
+                # Parallel schon von einem anderen Lauf angelegt
+                if not os.path.isdir(cache_dir):
+                    raise
+        finally:
+            # Auch bei Abbruch (Ctrl-C) keine halben Render-Verzeichnisse zurücklassen
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return [Image.open(os.path.join(cache_dir, name)) for name in sorted(os.listdir(cache_dir))]
+
+
+def prune_raster_cache(cached_hashes, max_age_days=RASTER_CACHE_MAX_AGE_DAYS):
+    """
+    Raster-Cache aufräumen: Seiten von Belegen mit gespeichertem JSON-Eintrag werden nicht
+    mehr gebraucht, ältere Verzeichnisse und verwaiste Temp-Verzeichnisse fallen ebenfalls weg.
+    """
+    if not os.path.isdir(RASTER_CACHE_DIR):
+        return
+    cutoff = time.time() - max_age_days * 86400
+    for name in os.listdir(RASTER_CACHE_DIR):
+        path = os.path.join(RASTER_CACHE_DIR, name)
+        try:
+            if name.startswith('.tmp_'):
+                # Temp-Verzeichnisse laufender Renderings erst nach einer Stunde entfernen
+                stale = os.path.getmtime(path) < time.time() - 3600
+            else:
+                stale = name.rsplit('_', 1)[0] in cached_hashes or os.path.getmtime(path) < cutoff
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
 
-        for idx, img in enumerate(images):
-            # Erstes Bild für Claude Vision
-            if idx == 0:
-                img_for_ai = img.copy()
-                img_for_ai.thumbnail((1568, 1568), Image.LANCZOS)
-                if img_for_ai.mode in ('RGBA', 'P'):
-                    img_for_ai = img_for_ai.convert('RGB')
-                buffer = io.BytesIO()
-                img_for_ai.save(buffer, format='JPEG', quality=85)
-                first_image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
 
-            # OCR
-            width, height = img.size
-            if width < 2000:
-                scale = 2000 / width
-                img = img.resize((int(width * scale), int(height * scale)), Image.LANCZOS)
-            img_gray = img.convert('L')
-            text = pytesseract.image_to_string(img_gray, lang='deu+eng', config='--oem 3 --psm 3')
-            full_text += text + "\n"
+# Zielbreite für OCR: schmalere Bilder werden hoch-, breitere (Kamerafotos) herunterskaliert
+OCR_WIDTH = 2000
 
-        full_text = full_text.strip()
 
-        # Claude AI Analyse
-        if not client:
-            return None, "Kein API Client"
+def downscale(img, max_width=OCR_WIDTH):
+    """
+    Bild auf max_width Breite verkleinern, damit OCR und Claude-Upload nicht mit vollen
+    Kamera-Megapixeln arbeiten. JPEGs werden per draft() schon beim Dekodieren verkleinert,
+    LANCZOS erhält danach die Schriftkanten besser als BILINEAR.
+    """
+    width, height = img.size
+    if width <= max_width:
+        return img
+    new_size = (max_width, int(height * max_width / width))
+    if img.format == 'JPEG':
+        img.draft(img.mode, new_size)
+    return img.resize(new_size, Image.LANCZOS)
+
 
-        prompt = """Analysiere diesen Beleg und extrahiere die Daten als JSON.
+OCR_LANG = 'deu+eng'
+OCR_CONFIG = '--oem 3 --psm 3'
+
+
+# Eine tesserocr-API je Worker-Thread (PyTessBaseAPI ist nicht thread-sicher)
+_tess_local = threading.local()
+
+
+def get_tess_api():
+    """tesserocr-API des aktuellen Threads, Sprachmodelle werden nur einmal geladen"""
+    api = getattr(_tess_local, 'api', None)
+    if api is None:
+        # Gleiche Einstellungen wie OCR_CONFIG ('--oem 3 --psm 3') für pytesseract
+        api = PyTessBaseAPI(lang=OCR_LANG, psm=PSM.AUTO, oem=OEM.DEFAULT)
+        _tess_local.api = api
+    return api
+
+
+def batch_ocr(images):
+    """
+    OCR für mehrere Bilder mit einem einzigen tesseract-Aufruf.
+    Mit tesserocr läuft tesseract im Prozess und alle Bilder nutzen dieselbe API.
+    Sonst werden die Bilder in ein Temp-Verzeichnis geschrieben, tesseract liest die Pfadliste
+    aus einer .txt-Datei und trennt die Seiten im Ergebnis mit Form-Feed (\x0c).
+    Gibt die Texte in der Reihenfolge der Bilder zurück.
+    images darf ein Generator sein, dann wird jede Seite einzeln abgearbeitet und nicht
+    alle gleichzeitig im Speicher gehalten.
+    """
+    if TESSEROCR_AVAILABLE:
+        api = get_tess_api()
+        texts = []
+        for img in images:
+            api.SetImage(img)
+            texts.append(api.GetUTF8Text())
+        return texts
+
+    images = iter(images)
+    first = next(images, None)
+    if first is None:
+        return []
+    second = next(images, None)
+    if second is None:
+        return [pytesseract.image_to_string(first, lang=OCR_LANG, config=OCR_CONFIG)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        for idx, img in enumerate(chain((first, second), images)):
+            path = os.path.join(tmpdir, f'{idx:04d}.png')
+            img.save(path)
+            paths.append(path)
+        first = second = None
+        list_file = os.path.join(tmpdir, 'list.txt')
+        with open(list_file, 'w') as f:
+            f.write('\n'.join(paths) + '\n')
+        text = pytesseract.image_to_string(list_file, lang=OCR_LANG, config=OCR_CONFIG)
+
+    texts = text.split('\x0c')[:len(paths)]
+    return texts + [''] * (len(paths) - len(texts))
+
+
+# JSON-Antwort in Markdown-Codeblock ("```json ... ```"), Inhalt in Gruppe 1
+JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL)
+
+
+def strip_json_fence(text):
+    """Entfernt den Markdown-Codeblock um eine JSON-Antwort (Text danach wird ignoriert)."""
+    text = text.strip()
+    fence_match = JSON_FENCE_RE.search(text)
+    if fence_match:
+        return fence_match.group(1)
+    # Codeblock ohne schließende Backticks
+    if text.startswith('```'):
+        text = text[3:]
+        if text.startswith('json'):
+            text = text[4:]
+    return text.strip()
+
+# Anweisung an Claude, der OCR-Text wird direkt angehängt
+RECEIPT_PROMPT = """Analysiere diesen Beleg und extrahiere die Daten als JSON.
 Antworte NUR mit dem JSON-Objekt.
 
 Kategorien:
@@ -444,7 +704,73 @@ WICHTIG zur Währung:
 - Bei Uber/Taxi: "Gesamtbetrag" ist der richtige Wert
 
 Beleg-Text:
-""" + full_text
+"""
+
+
+def process_receipt(filepath, client, cache=None, use_cache=True, file_hash=None):
+    """Einzelnen Beleg verarbeiten (mit Cache-Support, file_hash optional vorberechnet)"""
+    filename = os.path.basename(filepath).lower()
+    images = []
+
+    # Hash einmal bestimmen: Cache-Lookup, Raster-Cache und file_hash im Ergebnis
+    if file_hash is None:
+        file_hash = get_file_hash(filepath)
+
+    # Cache prüfen
+    if use_cache and cache is not None:
+        if file_hash in cache:
+            cached_data = cache[file_hash]
+            cached_data['datei'] = os.path.basename(filepath)
+            cached_data['_cached'] = True
+            return cached_data, None
+
+    try:
+        if filename.endswith('.pdf'):
+            if not PDF_SUPPORT:
+                return None, "PDF-Support nicht verfügbar"
+            images = rasterize_pdf_cached(filepath, file_hash)
+        elif filename.endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif')):
+            images = [downscale(Image.open(filepath))]
+        else:
+            return None, "Nicht unterstütztes Format"
+
+        # Seiten werden einmal in Graustufen gewandelt, bevor skaliert wird: OCR und
+        # Claude-Bild nutzen dasselbe L-Bild, und jedes Resize läuft nur auf einem Kanal
+        first_gray = images[0].convert('L') if images else None
+
+        # Erstes Bild für Claude Vision (nur kodieren, wenn die Anfrage auch gestellt wird)
+        first_image_base64 = None
+        if client and images:
+            img = images[0]
+            if img.format == 'JPEG' and img.mode in ('RGB', 'L') and max(img.size) <= 1568:
+                # JPEG passt bereits: Dateibytes direkt senden statt dekodieren und neu kodieren
+                with open(filepath, 'rb') as f:
+                    first_image_base64 = base64.b64encode(f.read()).decode('utf-8')
+            else:
+                img_for_ai = first_gray.copy()
+                img_for_ai.thumbnail((1568, 1568), Image.LANCZOS)
+                buffer = io.BytesIO()
+                img_for_ai.save(buffer, format='JPEG', quality=85)
+                first_image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+        # OCR: Seiten einzeln vorbereiten und weiterreichen, dann alle in einem tesseract-Lauf
+        def ocr_pages():
+            for idx, page in enumerate(images):
+                img = first_gray if idx == 0 else page.convert('L')
+                page.close()
+                width, height = img.size
+                if width < OCR_WIDTH:
+                    scale = OCR_WIDTH / width
+                    img = img.resize((int(width * scale), int(height * scale)), Image.LANCZOS)
+                yield img
+
+        full_text = "\n".join(batch_ocr(ocr_pages())).strip()
+
+        # Claude AI Analyse
+        if not client:
+            return None, "Kein API Client"
+
+        prompt = RECEIPT_PROMPT + full_text
 
         message = client.messages.create(
             model="claude-sonnet-4-20250514",
@@ -465,18 +791,12 @@ Beleg-Text:
             }]
         )
 
-        response_text = message.content[0].text.strip()
-        if response_text.startswith('```'):
-            response_text = response_text.split('```')[1]
-            if response_text.startswith('json'):
-                response_text = response_text[4:]
-        response_text = response_text.strip()
+        response_text = strip_json_fence(message.content[0].text)
 
         data = json.loads(response_text)
         data['datei'] = os.path.basename(filepath)
 
-        # File-Hash berechnen und mit speichern (für Beleg-Lookup)
-        file_hash = get_file_hash(filepath)
+        # File-Hash mit speichern (für Beleg-Lookup)
         data['file_hash'] = file_hash
 
         # In Cache speichern (mit vollständigem Pfad für späteren Zugriff)
@@ -503,18 +823,35 @@ def scan_folder(folder_path):
     return sorted(files)
 
 
+@lru_cache(maxsize=4096)
 def parse_datum(datum_str):
     """
     Parst ein Datum-String (z.B. '23.11.2025') und gibt ein datetime-Objekt zurück.
     Fallback: datetime.min für ungültige Daten (sortiert ans Ende).
+    Gecacht, da Excel- und PDF-Export dieselben Daten mehrfach sortieren.
     """
     if not datum_str:
         return datetime.min
 
+    datum_str = datum_str.strip()
+
+    # Schneller Weg für die üblichen Formate 'TT.MM.JJJJ' und 'JJJJ-MM-TT' ohne strptime
+    if len(datum_str) == 10 and datum_str[2] == datum_str[5] == '.':
+        parts = (datum_str[6:10], datum_str[3:5], datum_str[0:2])
+    elif len(datum_str) == 10 and datum_str[4] == datum_str[7] == '-':
+        parts = (datum_str[0:4], datum_str[5:7], datum_str[8:10])
+    else:
+        parts = None
+    if parts and ''.join(parts).isdigit():
+        try:
+            return datetime(*map(int, parts))
+        except ValueError:
+            pass
+
     # Versuche verschiedene Formate
     for fmt in ['%d.%m.%Y', '%d.%m.%y', '%Y-%m-%d', '%d/%m/%Y']:
         try:
-            return datetime.strptime(datum_str.strip(), fmt)
+            return datetime.strptime(datum_str, fmt)
         except ValueError:
             continue
 
@@ -526,86 +863,81 @@ def sort_expenses_by_date(expenses):
     return sorted(expenses, key=lambda e: parse_datum(e.get('datum', '')))
 
 
+def group_by_category(expenses):
+    """
+    Gruppiert Expenses in einem Durchlauf nach Kategorie.
+    Liefert (Kategoriename, nach Datum sortierte Expenses) in CATEGORIES-Reihenfolge,
+    leere und unbekannte Kategorien entfallen.
+    """
+    by_category = defaultdict(list)
+    for exp in expenses:
+        by_category[exp.get('kategorie', 'sonstiges')].append(exp)
+
+    return [(cat_name, sort_expenses_by_date(by_category[cat_key]))
+            for cat_key, cat_name in CATEGORIES.items() if cat_key in by_category]
+
+
+# Excel-Styles: einmal beim Import erzeugen und für alle Zellen wiederverwenden
+HEADER_FONT = Font(bold=True, color='FFFFFF')
+HEADER_FILL = PatternFill('solid', fgColor='333333')
+TITLE_FONT = Font(size=14, bold=True)
+BOLD_FONT = Font(bold=True)
+TOTAL_FONT = Font(size=12, bold=True)
+
+
+def styled_cell(ws, value, font=None, fill=None):
+    """Erzeugt eine formatierte Zelle für Worksheets im write_only-Modus."""
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    return cell
+
+
 def export_excel(expenses, meta, output_path):
-    """Excel-Export"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = meta.get('monat', 'Spesen')
+    """Excel-Export (write_only: Zeilen werden gestreamt statt als Zellobjekte gehalten)"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=meta.get('monat', 'Spesen'))
 
-    # Styles
-    header_font = Font(bold=True, color='FFFFFF')
-    header_fill = PatternFill('solid', fgColor='333333')
+    # Spaltenbreiten (müssen vor der ersten Zeile gesetzt sein)
+    ws.column_dimensions['A'].width = 5
+    ws.column_dimensions['B'].width = 12
+    ws.column_dimensions['C'].width = 35
+    ws.column_dimensions['D'].width = 25
+    ws.column_dimensions['E'].width = 15
 
     # Header
-    ws['A1'] = f"Spesenabrechnung {meta.get('monat', '')}"
-    ws['A1'].font = Font(size=14, bold=True)
-    ws['A2'] = meta.get('name', '')
-    ws['D1'] = f"Erstellt: {datetime.now().strftime('%d.%m.%Y')}"
+    ws.append([styled_cell(ws, f"Spesenabrechnung {meta.get('monat', '')}", font=TITLE_FONT),
+               None, None, f"Erstellt: {datetime.now().strftime('%d.%m.%Y')}"])
+    ws.append([meta.get('name', '')])
+    ws.append([])
 
-    row = 4
     gesamt = 0
 
-    # Nach Kategorien gruppieren
-    by_category = {}
-    for exp in expenses:
-        cat = exp.get('kategorie', 'sonstiges')
-        if cat not in by_category:
-            by_category[cat] = []
-        by_category[cat].append(exp)
-
-    # Jede Kategorie nach Datum sortieren
-    for cat in by_category:
-        by_category[cat] = sort_expenses_by_date(by_category[cat])
-
-    for cat_key, cat_name in CATEGORIES.items():
-        cat_expenses = by_category.get(cat_key, [])
-        if not cat_expenses:
-            continue
+    for cat_name, cat_expenses in group_by_category(expenses):
 
         # Kategorie-Header
-        ws.cell(row=row, column=1, value=cat_name)
-        ws.cell(row=row, column=1).font = header_font
-        ws.cell(row=row, column=1).fill = header_fill
-        for col in range(2, 6):
-            ws.cell(row=row, column=col).fill = header_fill
-
-        headers = ['Datum', 'Beschreibung', 'Anbieter', 'Betrag']
-        for i, h in enumerate(headers, 2):
-            ws.cell(row=row, column=i, value=h)
-            ws.cell(row=row, column=i).font = header_font
-        row += 1
+        ws.append([styled_cell(ws, value, font=HEADER_FONT, fill=HEADER_FILL)
+                   for value in (cat_name, 'Datum', 'Beschreibung', 'Anbieter', 'Betrag')])
 
         cat_sum = 0
         for exp in cat_expenses:
-            ws.cell(row=row, column=2, value=exp.get('datum', ''))
-            ws.cell(row=row, column=3, value=exp.get('beschreibung', ''))
-            ws.cell(row=row, column=4, value=exp.get('anbieter', ''))
             betrag = float(exp.get('betrag', 0) or 0)
             waehrung = exp.get('waehrung', 'EUR')
-            ws.cell(row=row, column=5, value=f"{betrag:.2f} {waehrung}")
+            ws.append([None, exp.get('datum', ''), exp.get('beschreibung', ''),
+                       exp.get('anbieter', ''), f"{betrag:.2f} {waehrung}"])
             cat_sum += betrag
-            row += 1
 
         # Kategorie-Summe
-        ws.cell(row=row, column=4, value="Summe:")
-        ws.cell(row=row, column=4).font = Font(bold=True)
-        ws.cell(row=row, column=5, value=f"{cat_sum:.2f} EUR")
-        ws.cell(row=row, column=5).font = Font(bold=True)
+        ws.append([None, None, None, styled_cell(ws, "Summe:", font=BOLD_FONT),
+                   styled_cell(ws, f"{cat_sum:.2f} EUR", font=BOLD_FONT)])
+        ws.append([])
         gesamt += cat_sum
-        row += 2
 
     # Gesamtsumme
-    ws.cell(row=row, column=4, value="GESAMT:")
-    ws.cell(row=row, column=4).font = Font(size=12, bold=True)
-    ws.cell(row=row, column=5, value=f"{gesamt:.2f} EUR")
-    ws.cell(row=row, column=5).font = Font(size=12, bold=True)
-
-    # Spaltenbreiten
-    ws.column_dimensions['A'].width = 5
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 35
-    ws.column_dimensions['D'].width = 25
-    ws.column_dimensions['E'].width = 15
+    ws.append([None, None, None, styled_cell(ws, "GESAMT:", font=TOTAL_FONT),
+               styled_cell(ws, f"{gesamt:.2f} EUR", font=TOTAL_FONT)])
 
     wb.save(output_path)
     return gesamt
@@ -618,6 +950,25 @@ def get_db():
     return conn
 
 
+# Fallback-Typ für sonstiges: Schlüsselwort -> Typ, Reihenfolge = Priorität
+SONSTIGES_TYPEN = {
+    'uber': 'Uber', 'bolt': 'Uber', 'taxi': 'Taxi', 'park': 'Parken', 'hotel': 'Hotel',
+    'verpflegung': 'Verpflegungspauschale', 'pauschale': 'Verpflegungspauschale',
+}
+# 'bolt' zählt nur im Anbieter, Verpflegung/Pauschale nur in der Beschreibung
+TYP_BESCHREIBUNG_RE = re.compile(r'uber|taxi|park|hotel|verpflegung|pauschale')
+TYP_ANBIETER_RE = re.compile(r'uber|bolt|taxi|park|hotel')
+
+
+def get_datum_iso(datum):
+    """
+    Leitet die Spalte datum_iso der ausgaben-Tabelle aus dem Datum einer Ausgabe ab
+    (JJJJ-MM-TT oder '' - gleiche Logik wie get_datum_iso in app.py).
+    """
+    parsed = parse_datum(datum) if isinstance(datum, str) else datetime.min
+    return parsed.strftime('%Y-%m-%d') if parsed != datetime.min else ''
+
+
 def save_to_database(expenses, meta):
     """Speichert die Abrechnung in der SQLite-Datenbank (fügt hinzu, überschreibt nicht)"""
     with get_db() as conn:
@@ -643,10 +994,11 @@ def save_to_database(expenses, meta):
             ''', (meta.get('name', ''), meta.get('monat', ''), meta.get('datum')))
             abrechnung_id = cursor.lastrowid
 
-        # Ausgaben nach Kategorien gruppiert speichern
+        # Ausgaben nach Kategorien gruppiert speichern (gesammelt, ein executemany)
+        rows = []
         for exp in expenses:
             kategorie = exp.get('kategorie', 'sonstiges')
-            if kategorie not in CATEGORIES:
+            if kategorie not in CATEGORY_KEYS:
                 kategorie = 'sonstiges'
 
             # Daten für DB aufbereiten (Format wie Web-App erwartet)
@@ -670,18 +1022,10 @@ def save_to_database(expenses, meta):
                     beschreibung = (exp.get('beschreibung', '') or '').lower()
                     anbieter = (exp.get('anbieter', '') or '').lower()
 
-                    if 'uber' in beschreibung or 'uber' in anbieter or 'bolt' in anbieter:
-                        typ = 'Uber'
-                    elif 'taxi' in beschreibung or 'taxi' in anbieter:
-                        typ = 'Taxi'
-                    elif 'park' in beschreibung or 'park' in anbieter:
-                        typ = 'Parken'
-                    elif 'hotel' in beschreibung or 'hotel' in anbieter:
-                        typ = 'Hotel'
-                    elif 'verpflegung' in beschreibung or 'pauschale' in beschreibung:
-                        typ = 'Verpflegungspauschale'
-                    else:
-                        typ = 'Sonstiges'
+                    found = set(TYP_BESCHREIBUNG_RE.findall(beschreibung))
+                    found.update(TYP_ANBIETER_RE.findall(anbieter))
+                    typ = next((name for keyword, name in SONSTIGES_TYPEN.items() if keyword in found),
+                               'Sonstiges')
 
                 # Ort zusammenbauen: Stadt + km wenn vorhanden
                 betrag = exp.get('betrag', 0)
@@ -724,11 +1068,20 @@ def save_to_database(expenses, meta):
             if exp.get('file_hash'):
                 daten['file_hash'] = exp.get('file_hash')
 
-            conn.execute('''
+            rows.append((abrechnung_id, kategorie, json.dumps(daten), get_datum_iso(daten['datum'])))
+
+        # datum_iso nur, wenn die Web-App die Spalte schon angelegt hat (sonst füllt sie sie beim Start nach)
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(ausgaben)')}
+        if 'datum_iso' in columns:
+            conn.executemany('''
+                INSERT INTO ausgaben (abrechnung_id, kategorie, daten, datum_iso)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+        else:
+            conn.executemany('''
                 INSERT INTO ausgaben (abrechnung_id, kategorie, daten)
                 VALUES (?, ?, ?)
-            ''', (abrechnung_id, kategorie, json.dumps(daten)))
-
+            ''', [row[:3] for row in rows])
         conn.commit()
         return abrechnung_id
 
@@ -752,39 +1105,21 @@ def export_pdf(expenses, meta, output_path):
 
     gesamt = 0
 
-    # Nach Kategorien gruppieren
-    by_category = {}
-    for exp in expenses:
-        cat = exp.get('kategorie', 'sonstiges')
-        if cat not in by_category:
-            by_category[cat] = []
-        by_category[cat].append(exp)
-
-    # Jede Kategorie nach Datum sortieren
-    for cat in by_category:
-        by_category[cat] = sort_expenses_by_date(by_category[cat])
-
-    for cat_key, cat_name in CATEGORIES.items():
-        cat_expenses = by_category.get(cat_key, [])
-        if not cat_expenses:
-            continue
+    for cat_name, cat_expenses in group_by_category(expenses):
 
         elements.append(Paragraph(cat_name, styles['Heading2']))
 
-        table_data = [['Datum', 'Beschreibung', 'Anbieter', 'Betrag']]
-        cat_sum = 0
-
-        for exp in cat_expenses:
-            betrag = float(exp.get('betrag', 0) or 0)
-            waehrung = exp.get('waehrung', 'EUR')
-            table_data.append([
-                exp.get('datum', ''),
-                exp.get('beschreibung', '')[:40],
-                exp.get('anbieter', '')[:25],
-                f"{betrag:.2f} {waehrung}"
-            ])
-            cat_sum += betrag
+        betraege = [float(exp.get('betrag', 0) or 0) for exp in cat_expenses]
+        cat_sum = sum(betraege)
 
+        table_data = [['Datum', 'Beschreibung', 'Anbieter', 'Betrag']]
+        table_data += [
+            [exp.get('datum', ''),
+             (exp.get('beschreibung', '') or '')[:40],
+             (exp.get('anbieter', '') or '')[:25],
+             f"{betrag:.2f} {exp.get('waehrung', 'EUR')}"]
+            for exp, betrag in zip(cat_expenses, betraege)
+        ]
         table_data.append(['', '', 'Summe:', f"{cat_sum:.2f} EUR"])
         gesamt += cat_sum
 
@@ -818,6 +1153,19 @@ def export_pdf(expenses, meta, output_path):
     return gesamt
 
 
+def get_worker_count(default=4):
+    """Liest SPESEN_WORKERS; ungültige Werte (keine Zahl, < 1) fallen auf den Standard zurück."""
+    value = os.getenv('SPESEN_WORKERS', str(default))
+    try:
+        workers = int(value)
+    except ValueError:
+        workers = 0
+    if workers < 1:
+        print(f"⚠️  Ungültiger Wert für SPESEN_WORKERS: {value!r} - verwende {default}")
+        return default
+    return workers
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Spesen CLI - Automatische Spesenabrechnung aus Belegen',
@@ -867,6 +1215,9 @@ Inbox/Archiv Workflow:
 
     print(f"📄 {len(files)} Belege gefunden")
 
+    # Hashes aller Belege vorab parallel berechnen (Cache-Lookup und file_hash)
+    file_hashes = hash_files(files)
+
     # Cache laden
     use_cache = not args.no_cache
     cache = load_cache() if use_cache else {}
@@ -886,11 +1237,39 @@ Inbox/Archiv Workflow:
     errors = []
     processed_files = []  # Erfolgreich verarbeitete Dateien für Archivierung
 
+    # Belege parallel verarbeiten: OCR läuft als tesseract-Subprozess, Claude ist Netzwerk-I/O,
+    # daher genügen Threads. Pro tesseract-Prozess nur ein Thread, damit sich die Kerne nicht überbuchen.
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+    def run(filepath):
+        return process_receipt(filepath, client, cache=cache, use_cache=use_cache,
+                               file_hash=file_hashes.get(filepath))
+
+    # Identische Belege (gleicher Hash) nur einmal an OCR/Claude geben
+    first_by_hash = {}
+    for filepath in files:
+        first_by_hash.setdefault(file_hashes[filepath], filepath)
+    unique_files = list(first_by_hash.values())
+    if len(unique_files) < len(files):
+        print(f"🔁 {len(files) - len(unique_files)} doppelte Belege werden nur einmal verarbeitet\n")
+
+    executor = ThreadPoolExecutor(max_workers=get_worker_count())
+    results = executor.map(run, unique_files)  # Ergebnisse in Reihenfolge der Dateien
+    errors_by_hash = {}
+
     for i, filepath in enumerate(files, 1):
         filename = os.path.basename(filepath)
         print(f"[{i}/{len(files)}] Verarbeite: {filename}", end=" ", flush=True)
 
-        data, error = process_receipt(filepath, client, cache=cache, use_cache=use_cache)
+        file_hash = file_hashes[filepath]
+        if first_by_hash[file_hash] == filepath:
+            data, error = next(results)
+            errors_by_hash[file_hash] = error
+        elif errors_by_hash[file_hash]:
+            data, error = None, errors_by_hash[file_hash]
+        else:
+            # Duplikat: Ergebnis des ersten Belegs liegt bereits im Cache
+            data, error = process_receipt(filepath, client, cache=cache, file_hash=file_hash)
 
         if data:
             is_cached = data.pop('_cached', False)
@@ -918,9 +1297,13 @@ Inbox/Archiv Workflow:
             errors.append((filename, error))
             print(f"❌ {error}")
 
+    executor.shutdown()
+
     # Cache speichern
     if use_cache:
         save_cache(cache)
+    # Gerasterte Seiten der jetzt gecachten Belege werden nicht mehr gebraucht
+    prune_raster_cache(cache if use_cache else ())
 
     print(f"\n{'='*60}")
     print(f"✅ Erfolgreich: {len(expenses)} Belege", end="")
@@ -967,15 +1350,22 @@ Inbox/Archiv Workflow:
         # Automatischer Pfad: exports/2025/11_November/Spesen_Nov_2025
         base_output = os.path.join(export_dir, f"Spesen_{monat_safe}")
 
-    if args.format in ('excel', 'both'):
-        excel_path = base_output if base_output.endswith('.xlsx') else f"{base_output}.xlsx"
-        export_excel(expenses, meta, excel_path)
-        print(f"\n📊 Excel exportiert: {excel_path}")
-
-    if args.format in ('pdf', 'both'):
-        pdf_path = base_output if base_output.endswith('.pdf') else f"{base_output}.pdf"
-        export_pdf(expenses, meta, pdf_path)
-        print(f"📄 PDF exportiert: {pdf_path}")
+    # Excel und PDF parallel erzeugen (wie beim ZIP-Export der Web-App)
+    with ThreadPoolExecutor(max_workers=2) as export_pool:
+        excel_job = pdf_job = None
+        if args.format in ('excel', 'both'):
+            excel_path = base_output if base_output.endswith('.xlsx') else f"{base_output}.xlsx"
+            excel_job = export_pool.submit(export_excel, expenses, meta, excel_path)
+        if args.format in ('pdf', 'both'):
+            pdf_path = base_output if base_output.endswith('.pdf') else f"{base_output}.pdf"
+            pdf_job = export_pool.submit(export_pdf, expenses, meta, pdf_path)
+
+        if excel_job:
+            excel_job.result()
+            print(f"\n📊 Excel exportiert: {excel_path}")
+        if pdf_job:
+            pdf_job.result()
+            print(f"📄 PDF exportiert: {pdf_path}")
 
     if args.format == 'json':
         json_path = base_output if base_output.endswith('.json') else f"{base_output}.json"
@@ -988,9 +1378,10 @@ Inbox/Archiv Workflow:
     if args.archive and processed_files:
         print(f"\n📦 Archiviere {len(processed_files)} Belege...")
         archiv_dir = get_archiv_dir(meta.get('monat', ''))
+        existing = set(os.listdir(archiv_dir))
         archived_count = 0
         for filepath in processed_files:
-            result = archive_file(filepath, meta.get('monat', ''))
+            result = archive_file(filepath, meta.get('monat', ''), existing)
             if result:
                 archived_count += 1
                 if args.verbose:
@@ -8,12 +8,23 @@ bind = "0.0.0.0:5000"
 backlog = 2048
 
 # Worker Processes
-workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
-worker_class = "sync"
+# gthread: Requests warten überwiegend auf OCR-Subprozesse und die Claude-API,
+# mehrere Threads pro Worker überlappen diese Wartezeiten
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+if worker_class == "sync":
+    workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+else:
+    workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
 worker_connections = 1000
 timeout = 120
 keepalive = 5
 
+# App einmal im Master laden: Imports (openpyxl, reportlab, anthropic, PIL ...) und
+# Modul-Konstanten teilen sich die Worker per Copy-on-Write statt sie je Worker zu laden.
+# Der Encryption-Key wird in on_starting im Master erzeugt (siehe unten)
+preload_app = True
+
 # Process Naming
 proc_name = "spesen-app"
 
@@ -43,7 +54,14 @@ tmp_upload_dir = None
 # Hooks
 def on_starting(server):
     """Called just before the master process is initialized."""
-    pass
+    # PIL-Bildformat-Plugins vorab registrieren (sonst beim ersten Upload je Worker)
+    from PIL import Image
+    Image.init()
+
+    # Encryption-Key einmal im Master ermitteln (ggf. secret.key anlegen) - die Worker
+    # erben Key und Fernet-Instanz per fork, statt beim ersten Request parallel zu erzeugen
+    from app import get_cipher
+    get_cipher()
 
 def on_reload(server):
     """Called before the master process reloads workers."""
@@ -3,8 +3,10 @@
 Migration Script: Verknüpft bestehende Ausgaben mit file_hash aus dem Cache.
 
 Matching-Strategie:
-1. Datum + Betrag müssen übereinstimmen
-2. Bei mehreren Matches: Beschreibung/Anbieter vergleichen
+1. Eindeutiger Dateiname (datei/datei_pfad) im Cache: direkt verknüpfen
+2. Sonst müssen Datum + Betrag übereinstimmen
+3. Kandidaten mit gleicher Kategorie haben Vorrang (sonst alle Kandidaten)
+4. Bei mehreren Matches: Beschreibung/Anbieter vergleichen
 """
 
 import json
@@ -12,16 +14,63 @@ import os
 import sqlite3
 from difflib import SequenceMatcher
 
+# Optional: RapidFuzz (C++-Implementierung, deutlich schneller; Fallback: difflib)
+try:
+    from rapidfuzz import fuzz, process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# Optional: orjson für schnellere JSON-Verarbeitung (Fallback: json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(__file__), 'data'))
 DATABASE = os.path.join(DATA_DIR, 'spesen.db')
 CACHE_FILE = os.path.join(DATA_DIR, '.beleg_cache.json')
 
-
-def similarity(a, b):
-    """Berechnet Ähnlichkeit zwischen zwei Strings (0-1)."""
-    if not a or not b:
-        return 0
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+# Ausgabe ohne file_hash (fehlt, null, leer) - entspricht "not daten.get('file_hash')"
+UNLINKED_SQL = "coalesce(json_extract(daten, '$.file_hash'), '') IN ('', 0)"
+
+
+def json_loads(data):
+    """Parst JSON aus str oder bytes (orjson falls verfügbar)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def score_candidates(db_text, cache_texts):
+    """
+    Berechnet die Ähnlichkeit von db_text zu allen Kandidaten (0-1).
+    Erwartet bereits kleingeschriebene Texte (einmal pro Zeile/Cache-Eintrag vorbereitet).
+    """
+    if not db_text:
+        return [0] * len(cache_texts)
+    scores = [0] * len(cache_texts)
+    if RAPIDFUZZ_AVAILABLE:
+        # Alle Kandidaten in einem Aufruf bewerten (Schleife läuft in C++)
+        # Indel-Ähnlichkeit, entspricht weitgehend SequenceMatcher.ratio()
+        for _, score, idx in process.extract(db_text, cache_texts, scorer=fuzz.ratio,
+                                             processor=None, limit=None):
+            if cache_texts[idx]:
+                scores[idx] = score / 100
+        return scores
+    matcher = SequenceMatcher(None, db_text)
+    for idx, cache_text in enumerate(cache_texts):
+        if cache_text:
+            matcher.set_seq2(cache_text)
+            scores[idx] = matcher.ratio()
+    return scores
+
+
+def get_datei_name(datei, datei_pfad):
+    """Dateiname aus datei bzw. datei_pfad (None wenn beides fehlt)."""
+    datei = datei or datei_pfad
+    return os.path.basename(datei) if isinstance(datei, str) else None
 
 
 def normalize_betrag(betrag):
@@ -54,21 +103,33 @@ def main():
         print(f"❌ Cache-Datei nicht gefunden: {CACHE_FILE}")
         return
 
-    with open(CACHE_FILE, 'r') as f:
-        cache = json.load(f)
+    with open(CACHE_FILE, 'rb') as f:
+        cache = json_loads(f.read())
 
     print(f"📦 Cache geladen: {len(cache)} Einträge")
 
-    # Cache-Index nach Datum+Betrag aufbauen
-    cache_index = {}  # {(datum, betrag): [(file_hash, cache_entry), ...]}
+    # Cache-Index nach Datum+Betrag (+Kategorie) aufbauen
+    # {(datum, betrag): [(file_hash, cache_entry, cache_text, kategorie), ...]}
+    cache_index = {}
+    cache_index_kategorie = {}  # {(datum, betrag, kategorie): [...]}
+    file_index = {}  # {dateiname: file_hash} - None bei mehrdeutigen Namen
     for file_hash, entry in cache.items():
+        datei_name = get_datei_name(entry.get('datei'), entry.get('datei_pfad'))
+        if datei_name:
+            file_index[datei_name] = None if datei_name in file_index else file_hash
+
         datum = normalize_datum(entry.get('datum'))
         betrag = normalize_betrag(entry.get('betrag'))
         if datum and betrag is not None:
-            key = (datum, betrag)
-            if key not in cache_index:
-                cache_index[key] = []
-            cache_index[key].append((file_hash, entry))
+            # Text zum Vergleichen einmal pro Cache-Eintrag aufbauen (kleingeschrieben)
+            cache_text = ' '.join(filter(None, [
+                entry.get('beschreibung', ''),
+                entry.get('anbieter', ''),
+                entry.get('stadt', '')
+            ])).lower()
+            candidate = (file_hash, entry, cache_text, entry.get('kategorie'))
+            cache_index.setdefault((datum, betrag), []).append(candidate)
+            cache_index_kategorie.setdefault((datum, betrag, candidate[3]), []).append(candidate)
 
     print(f"🔍 Index erstellt: {len(cache_index)} Datum+Betrag Kombinationen")
 
@@ -79,44 +140,65 @@ def main():
 
     conn = sqlite3.connect(DATABASE)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
     cursor = conn.cursor()
 
-    # Alle Ausgaben laden
-    cursor.execute('SELECT id, kategorie, daten FROM ausgaben')
+    # Bereits verknüpfte Ausgaben nur zählen
+    cursor.execute(f'SELECT COUNT(*) FROM ausgaben WHERE NOT ({UNLINKED_SQL})')
+    skipped = cursor.fetchone()[0]
+
+    # Nicht verknüpfte Ausgaben laden - nur die benötigten Felder, ohne das ganze JSON zu parsen
+    cursor.execute(f'''
+        SELECT id, kategorie,
+               json_extract(daten, '$.datum') AS datum,
+               json_extract(daten, '$.monat') AS monat,
+               json_extract(daten, '$.km') AS km,
+               json_extract(daten, '$.betrag') AS betrag,
+               json_extract(daten, '$.beschreibung') AS beschreibung,
+               json_extract(daten, '$.personen') AS personen,
+               json_extract(daten, '$.ort') AS ort,
+               json_extract(daten, '$.fahrstrecke') AS fahrstrecke,
+               json_extract(daten, '$.anlass') AS anlass,
+               json_extract(daten, '$.datei') AS datei,
+               json_extract(daten, '$.datei_pfad') AS datei_pfad
+        FROM ausgaben WHERE {UNLINKED_SQL}
+    ''')
     ausgaben = cursor.fetchall()
-    print(f"📊 Ausgaben geladen: {len(ausgaben)} Einträge")
+    print(f"📊 Ausgaben geladen: {len(ausgaben) + skipped} Einträge")
 
-    updated = 0
-    skipped = 0
+    updates = []  # (file_hash, id) für ein gemeinsames executemany
     not_found = 0
 
     for row in ausgaben:
         ausgabe_id = row['id']
         kategorie = row['kategorie']
-        daten = json.loads(row['daten'])
-
-        # Bereits verknüpft?
-        if daten.get('file_hash'):
-            skipped += 1
-            continue
 
         # Datum und Betrag extrahieren
-        datum = normalize_datum(daten.get('datum') or daten.get('monat'))
+        datum = normalize_datum(row['datum'] or row['monat'])
+
+        # Eindeutiger Dateiname bekannt? Dann ohne Ähnlichkeitsvergleich verknüpfen
+        datei_name = get_datei_name(row['datei'], row['datei_pfad'])
+        file_hash = file_index.get(datei_name) if datei_name else None
+        if file_hash:
+            updates.append((file_hash, ausgabe_id))
+            print(f"  ✅ ID {ausgabe_id}: {datum} -> {datei_name} (Dateiname)")
+            continue
 
         # Betrag je nach Kategorie
         if kategorie == 'fahrtkosten_kfz':
-            km = float(daten.get('km', 0) or 0)
+            km = float(row['km'] or 0)
             betrag = round(km * 0.30, 2)
         else:
-            betrag = normalize_betrag(daten.get('betrag'))
+            betrag = normalize_betrag(row['betrag'])
 
         if not datum or betrag is None:
             not_found += 1
             continue
 
-        # Im Cache suchen
-        key = (datum, betrag)
-        matches = cache_index.get(key, [])
+        # Im Cache suchen - zuerst nur Kandidaten derselben Kategorie
+        matches = (cache_index_kategorie.get((datum, betrag, kategorie))
+                   or cache_index.get((datum, betrag), []))
 
         if not matches:
             not_found += 1
@@ -128,25 +210,17 @@ def main():
 
         # Text zum Vergleichen aus DB-Eintrag
         db_text = ' '.join(filter(None, [
-            daten.get('beschreibung', ''),
-            daten.get('personen', ''),
-            daten.get('ort', ''),
-            daten.get('fahrstrecke', ''),
-            daten.get('anlass', '')
-        ]))
-
-        for file_hash, cache_entry in matches:
-            # Text zum Vergleichen aus Cache
-            cache_text = ' '.join(filter(None, [
-                cache_entry.get('beschreibung', ''),
-                cache_entry.get('anbieter', ''),
-                cache_entry.get('stadt', '')
-            ]))
-
-            score = similarity(db_text, cache_text)
-
+            row['beschreibung'],
+            row['personen'],
+            row['ort'],
+            row['fahrstrecke'],
+            row['anlass']
+        ])).lower()
+
+        scores = score_candidates(db_text, [cache_text for _, _, cache_text, _ in matches])
+        for (file_hash, _, _, cache_kategorie), score in zip(matches, scores):
             # Kategorie-Match gibt Bonus
-            if cache_entry.get('kategorie') == kategorie:
+            if cache_kategorie == kategorie:
                 score += 0.3
 
             if score > best_score:
@@ -154,13 +228,8 @@ def main():
                 best_match = file_hash
 
         if best_match:
-            # Update durchführen
-            daten['file_hash'] = best_match
-            cursor.execute(
-                'UPDATE ausgaben SET daten = ? WHERE id = ?',
-                (json.dumps(daten), ausgabe_id)
-            )
-            updated += 1
+            # Update vormerken
+            updates.append((best_match, ausgabe_id))
 
             # Details ausgeben
             cache_entry = cache[best_match]
@@ -168,8 +237,11 @@ def main():
         else:
             not_found += 1
 
+    # file_hash direkt in SQLite ins JSON schreiben (kein Parsen/Serialisieren in Python)
+    cursor.executemany("UPDATE ausgaben SET daten = json_set(daten, '$.file_hash', ?) WHERE id = ?", updates)
     conn.commit()
     conn.close()
+    updated = len(updates)
 
     print(f"\n📈 Zusammenfassung:")
     print(f"   ✅ Verknüpft: {updated}")
@@ -11,11 +11,15 @@ Verwendung:
 """
 
 import argparse
+import ctypes
 import hashlib
+import mmap
 import os
 import re
 import shutil
 import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -33,6 +37,13 @@ try:
 except ImportError:
     PDF_INFO_AVAILABLE = False
 
+# Optional: BLAKE3 (SIMD, mehrere Threads) für die Duplikat-Erkennung
+try:
+    from blake3 import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
 
 # Deutsche Monatsnamen für Ordner
 MONAT_NAMEN = {
@@ -48,67 +59,155 @@ MONAT_KURZ = {
     'sep': 9, 'okt': 10, 'oct': 10, 'nov': 11, 'dez': 12, 'dec': 12
 }
 
+# Datums-Patterns für Dateinamen in Prioritätsreihenfolge:
+# (Pattern, Umrechnung der Gruppen in (Jahr, Monat, Tag))
+DATE_PATTERNS = [
+    # Pattern 1: YYYY-MM-DD oder YYYY_MM_DD oder YYYYMMDD
+    (r'(20\d{2})[-_]?(0[1-9]|1[0-2])[-_]?(0[1-9]|[12]\d|3[01])', lambda g: (int(g[0]), int(g[1]), int(g[2]))),
+    # Pattern 2: DD.MM.YYYY oder DD-MM-YYYY
+    (r'(0[1-9]|[12]\d|3[01])[.\-](0[1-9]|1[0-2])[.\-](20\d{2})', lambda g: (int(g[2]), int(g[1]), int(g[0]))),
+    # Pattern 3: DD.MM.YY oder DD-MM-YY
+    (r'(0[1-9]|[12]\d|3[01])[.\-](0[1-9]|1[0-2])[.\-](\d{2})', lambda g: (2000 + int(g[2]), int(g[1]), int(g[0]))),
+    # Pattern 4: Monat Jahr (z.B. "november_2025", "nov2025"), Kürzel in MONAT_KURZ-Reihenfolge
+    *[(rf'{monat_kurz}\w*[_\-\s]*(20\d{{2}})', lambda g, monat_num=monat_num: (int(g[0]), monat_num, 1))
+      for monat_kurz, monat_num in MONAT_KURZ.items()],
+    # Pattern 5: Jahr Monat (z.B. "2025_november", "2025-11")
+    (r'(20\d{2})[_\-\s]*(0[1-9]|1[0-2])', lambda g: (int(g[0]), int(g[1]), 1)),
+]
+
+
+def build_date_re(patterns):
+    """
+    Fasst alle Datums-Patterns zu einer Regex zusammen (ein Durchlauf pro Dateiname).
+    Jede Alternative sucht per '.*?' ab Anfang, dadurch gewinnt wie bisher das erste
+    passende Pattern - nicht der früheste Treffer im Namen.
+    Gibt (Regex, {Gruppenindex: (Umrechnung, erste Gruppe, letzte Gruppe)}) zurück.
+    """
+    parts = []
+    handlers = {}
+    index = 1
+    for pattern, handler in patterns:
+        group_count = re.compile(pattern).groups
+        parts.append(f'.*?({pattern})')
+        handlers[index] = (handler, index, index + group_count)
+        index += group_count + 1
+    return re.compile('|'.join(parts), re.DOTALL), handlers
+
+
+DATE_RE, DATE_HANDLERS = build_date_re(DATE_PATTERNS)
+
+
+# Ab dieser Größe wird beim Hashen per mmap gelesen
+MMAP_MIN_SIZE = 1024 * 1024
+
 
 def get_file_hash(filepath):
-    """Berechnet MD5-Hash einer Datei"""
-    hasher = hashlib.md5()
+    """Berechnet Inhalts-Hash einer Datei (BLAKE3, Fallback: SHA-256)"""
+    if BLAKE3_AVAILABLE:
+        hasher = blake3(max_threads=blake3.AUTO)
+        hasher.update_mmap(filepath)
+        return hasher.hexdigest()
     with open(filepath, 'rb') as f:
-        for chunk in iter(lambda: f.read(65536), b''):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+        # Große Dateien direkt aus dem Page-Cache hashen (mmap statt read-Kopien)
+        if os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.sha256(mm).hexdigest()
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def clone_file(src, dst):
+    """
+    Legt dst als Copy-on-Write-Klon von src an (APFS clonefile, Btrfs/XFS FICLONE).
+    Gibt False zurück, wenn das Dateisystem keine Klone unterstützt.
+    """
+    if sys.platform == 'darwin':
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            return libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+        except (OSError, AttributeError):
+            return False
+    if sys.platform.startswith('linux'):
+        import fcntl
+        ficlone = getattr(fcntl, 'FICLONE', 0x40049409)
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'xb') as fdst:
+                try:
+                    fcntl.ioctl(fdst.fileno(), ficlone, fsrc.fileno())
+                    return True
+                except OSError:
+                    pass
+            os.unlink(dst)
+        except OSError:
+            pass
+    return False
+
+
+def copy_file(src, dst):
+    """Kopiert eine Datei inkl. Metadaten (per Klon wenn möglich, sonst shutil.copy2)"""
+    if clone_file(src, dst):
+        shutil.copystat(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+def try_file_hash(filepath):
+    """Wie get_file_hash, gibt aber (hash, fehler) zurück statt zu werfen"""
+    try:
+        return get_file_hash(filepath), None
+    except Exception as e:
+        return None, e
 
 
-def find_duplicates(files):
-    """Findet Duplikate anhand des MD5-Hashs"""
-    hash_to_files = {}  # {hash: [filepath1, filepath2, ...]}
+def find_duplicates(files, stats=None):
+    """Findet Duplikate anhand des Inhalts-Hashs (stats: {filepath: stat_result} aus scan_files)"""
+    hash_to_files = {}  # {hash oder ('size', größe): [filepath1, filepath2, ...]}
+    path_to_hash = {}  # {filepath: hash} - damit jede Datei nur einmal gehasht wird
 
+    # Nur Dateien gleicher Größe können Duplikate sein
+    stats = stats or {}
+    by_size = defaultdict(list)
     for filepath in files:
         try:
-            file_hash = get_file_hash(filepath)
-            if file_hash not in hash_to_files:
-                hash_to_files[file_hash] = []
-            hash_to_files[file_hash].append(filepath)
-        except Exception as e:
+            st = stats.get(filepath) or filepath.stat()
+            by_size[st.st_size].append(filepath)
+        except OSError as e:
             print(f"  ⚠️  Hash-Fehler bei {filepath.name}: {e}")
 
+    candidates = []
+    for size, group in by_size.items():
+        if len(group) == 1:
+            # Eindeutige Größe: kein Hash nötig, eigene Gruppe
+            hash_to_files[('size', size)] = group
+        else:
+            candidates.extend(group)
+
+    # Parallel hashen (hashlib/BLAKE3 geben beim Hashen den GIL frei)
+    with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as executor:
+        results = list(executor.map(try_file_hash, candidates))
+
+    for filepath, (file_hash, error) in zip(candidates, results):
+        if error is not None:
+            print(f"  ⚠️  Hash-Fehler bei {filepath.name}: {error}")
+            continue
+        path_to_hash[filepath] = file_hash
+        if file_hash not in hash_to_files:
+            hash_to_files[file_hash] = []
+        hash_to_files[file_hash].append(filepath)
+
     # Nur Gruppen mit mehr als einer Datei sind Duplikate
     duplicates = {h: files for h, files in hash_to_files.items() if len(files) > 1}
 
-    return hash_to_files, duplicates
+    return hash_to_files, duplicates, path_to_hash
 
 
 def extract_date_from_filename(filename):
     """Versucht ein Datum aus dem Dateinamen zu extrahieren"""
-    name = filename.lower()
-
-    # Pattern 1: YYYY-MM-DD oder YYYY_MM_DD oder YYYYMMDD
-    match = re.search(r'(20\d{2})[-_]?(0[1-9]|1[0-2])[-_]?(0[1-9]|[12]\d|3[01])', name)
-    if match:
-        return int(match.group(1)), int(match.group(2)), int(match.group(3))
-
-    # Pattern 2: DD.MM.YYYY oder DD-MM-YYYY
-    match = re.search(r'(0[1-9]|[12]\d|3[01])[.\-](0[1-9]|1[0-2])[.\-](20\d{2})', name)
-    if match:
-        return int(match.group(3)), int(match.group(2)), int(match.group(1))
-
-    # Pattern 3: DD.MM.YY oder DD-MM-YY
-    match = re.search(r'(0[1-9]|[12]\d|3[01])[.\-](0[1-9]|1[0-2])[.\-](\d{2})', name)
-    if match:
-        year = 2000 + int(match.group(3))
-        return year, int(match.group(2)), int(match.group(1))
-
-    # Pattern 4: Monat Jahr (z.B. "november_2025", "nov2025")
-    for monat_kurz, monat_num in MONAT_KURZ.items():
-        match = re.search(rf'{monat_kurz}\w*[_\-\s]*(20\d{{2}})', name)
-        if match:
-            return int(match.group(1)), monat_num, 1
-
-    # Pattern 5: Jahr Monat (z.B. "2025_november", "2025-11")
-    match = re.search(r'(20\d{2})[_\-\s]*(0[1-9]|1[0-2])', name)
-    if match:
-        return int(match.group(1)), int(match.group(2)), 1
-
-    return None
+    match = DATE_RE.match(filename.lower())
+    if not match:
+        return None
+    # Die äußere Gruppe der passenden Alternative schließt zuletzt
+    handler, first, last = DATE_HANDLERS[match.lastindex]
+    return handler(match.groups()[first:last])
 
 
 def extract_date_from_file_metadata(filepath):
@@ -133,17 +232,17 @@ def extract_date_from_file_metadata(filepath):
     return None
 
 
-def extract_date_from_modification_time(filepath):
+def extract_date_from_modification_time(filepath, stat=None):
     """Verwendet das Änderungsdatum der Datei als Fallback"""
     try:
-        mtime = os.path.getmtime(filepath)
+        mtime = stat.st_mtime if stat else os.path.getmtime(filepath)
         dt = datetime.fromtimestamp(mtime)
         return dt.year, dt.month, dt.day
     except Exception:
         return None
 
 
-def get_date_for_file(filepath, use_mtime=False):
+def get_date_for_file(filepath, use_mtime=False, stat=None):
     """Ermittelt das Datum für eine Datei (verschiedene Strategien)"""
     # 1. Aus Dateinamen
     date = extract_date_from_filename(filepath.name)
@@ -157,7 +256,7 @@ def get_date_for_file(filepath, use_mtime=False):
 
     # 3. Aus Änderungsdatum (optional)
     if use_mtime:
-        date = extract_date_from_modification_time(filepath)
+        date = extract_date_from_modification_time(filepath, stat)
         if date:
             return date, 'mtime'
 
@@ -178,16 +277,40 @@ def get_month_folder_name(year, month, format_style='german'):
 
 
 def scan_files(folder_path, recursive=False):
-    """Scannt Ordner nach Belegen"""
+    """
+    Scannt Ordner nach Belegen.
+    Gibt (sortierte Pfade, {Pfad: stat_result}) zurück, damit später kein weiterer stat nötig ist.
+    """
     supported = ('.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif')
-    folder = Path(folder_path)
+    stats = {}
+    stack = [folder_path]
 
-    if recursive:
-        files = [f for f in folder.rglob('*') if f.is_file() and f.suffix.lower() in supported]
-    else:
-        files = [f for f in folder.iterdir() if f.is_file() and f.suffix.lower() in supported]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    if entry.name.lower().endswith(supported):
+                        stats[Path(entry.path)] = entry.stat()
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+
+    return sorted(stats), stats
+
+
+def get_target_path(target_dir, filepath, existing):
+    """Ermittelt einen freien Zielpfad; existing: Set der Dateinamen im Zielordner"""
+    name = filepath.name
 
-    return sorted(files)
+    # Bei Namenskonflikt: Nummer anhängen
+    if name in existing:
+        stem = filepath.stem
+        suffix = filepath.suffix
+        counter = 1
+        while name in existing:
+            name = f"{stem}_{counter}{suffix}"
+            counter += 1
+
+    return target_dir / name
 
 
 def main():
@@ -209,7 +332,7 @@ Datum-Erkennung (Priorität):
   3. Aus Änderungsdatum (mit --use-mtime)
 
 Duplikat-Erkennung:
-  Dateien werden via MD5-Hash verglichen. Identische Dateien werden erkannt,
+  Dateien werden via Inhalts-Hash (BLAKE3/SHA-256) verglichen. Identische Dateien werden erkannt,
   auch wenn sie unterschiedliche Namen haben.
         """
     )
@@ -245,7 +368,7 @@ Duplikat-Erkennung:
 
     # Dateien scannen
     print(f"\n📁 Scanne: {args.folder}")
-    files = scan_files(args.folder, recursive=args.recursive)
+    files, stats = scan_files(args.folder, recursive=args.recursive)
 
     if not files:
         print("❌ Keine Belege gefunden (PDF, JPG, PNG, TIFF)")
@@ -254,8 +377,8 @@ Duplikat-Erkennung:
     print(f"📄 {len(files)} Dateien gefunden")
 
     # Duplikate erkennen
-    print(f"\n🔍 Prüfe auf Duplikate (MD5-Hash)...")
-    hash_to_files, duplicates = find_duplicates(files)
+    print(f"\n🔍 Prüfe auf Duplikate (Inhalts-Hash)...")
+    hash_to_files, duplicates, path_to_hash = find_duplicates(files, stats)
 
     # Duplikat-Statistik
     total_duplicates = sum(len(f) - 1 for f in duplicates.values())
@@ -278,16 +401,13 @@ Duplikat-Erkennung:
     seen_hashes = set()
 
     for filepath in files:
-        try:
-            file_hash = get_file_hash(filepath)
-            if args.skip_duplicates or args.duplicates_folder:
-                if file_hash in seen_hashes:
-                    skipped_duplicates.append(filepath)
-                    continue
-                seen_hashes.add(file_hash)
-            files_to_process.append((filepath, file_hash))
-        except Exception:
-            files_to_process.append((filepath, None))
+        file_hash = path_to_hash.get(filepath)
+        if file_hash and (args.skip_duplicates or args.duplicates_folder):
+            if file_hash in seen_hashes:
+                skipped_duplicates.append(filepath)
+                continue
+            seen_hashes.add(file_hash)
+        files_to_process.append((filepath, file_hash))
 
     print(f"\n{'='*60}")
 
@@ -296,7 +416,7 @@ Duplikat-Erkennung:
     unknown = []
 
     for filepath, file_hash in files_to_process:
-        date, source = get_date_for_file(filepath, use_mtime=args.use_mtime)
+        date, source = get_date_for_file(filepath, use_mtime=args.use_mtime, stat=stats.get(filepath))
 
         if date:
             year, month, day = date
@@ -359,24 +479,17 @@ Duplikat-Erkennung:
         folder_name = get_month_folder_name(year, month, args.format)
         target_dir = output_dir / folder_name
         target_dir.mkdir(parents=True, exist_ok=True)
+        existing = set(os.listdir(target_dir))
 
         for filepath, source, day, file_hash in files_list:
-            target_path = target_dir / filepath.name
-
-            # Bei Namenskonflikt: Nummer anhängen
-            if target_path.exists():
-                stem = filepath.stem
-                suffix = filepath.suffix
-                counter = 1
-                while target_path.exists():
-                    target_path = target_dir / f"{stem}_{counter}{suffix}"
-                    counter += 1
+            target_path = get_target_path(target_dir, filepath, existing)
 
             try:
                 if args.move:
                     shutil.move(str(filepath), str(target_path))
                 else:
-                    shutil.copy2(str(filepath), str(target_path))
+                    copy_file(filepath, target_path)
+                existing.add(target_path.name)
                 copied += 1
 
                 if args.verbose:
@@ -389,23 +502,17 @@ Duplikat-Erkennung:
     if unknown:
         unsorted_dir = output_dir / '_Unsortiert'
         unsorted_dir.mkdir(parents=True, exist_ok=True)
+        existing = set(os.listdir(unsorted_dir))
 
         for filepath, file_hash in unknown:
-            target_path = unsorted_dir / filepath.name
-
-            if target_path.exists():
-                stem = filepath.stem
-                suffix = filepath.suffix
-                counter = 1
-                while target_path.exists():
-                    target_path = unsorted_dir / f"{stem}_{counter}{suffix}"
-                    counter += 1
+            target_path = get_target_path(unsorted_dir, filepath, existing)
 
             try:
                 if args.move:
                     shutil.move(str(filepath), str(target_path))
                 else:
-                    shutil.copy2(str(filepath), str(target_path))
+                    copy_file(filepath, target_path)
+                existing.add(target_path.name)
                 copied += 1
             except Exception as e:
                 errors += 1
@@ -414,23 +521,17 @@ Duplikat-Erkennung:
     if args.duplicates_folder and skipped_duplicates:
         dup_dir = output_dir / '_Duplikate'
         dup_dir.mkdir(parents=True, exist_ok=True)
+        existing = set(os.listdir(dup_dir))
 
         for filepath in skipped_duplicates:
-            target_path = dup_dir / filepath.name
-
-            if target_path.exists():
-                stem = filepath.stem
-                suffix = filepath.suffix
-                counter = 1
-                while target_path.exists():
-                    target_path = dup_dir / f"{stem}_{counter}{suffix}"
-                    counter += 1
+            target_path = get_target_path(dup_dir, filepath, existing)
 
             try:
                 if args.move:
                     shutil.move(str(filepath), str(target_path))
                 else:
-                    shutil.copy2(str(filepath), str(target_path))
+                    copy_file(filepath, target_path)
+                existing.add(target_path.name)
             except Exception as e:
                 print(f"  ❌ Fehler bei Duplikat {filepath.name}: {e}")
 
@@ -0,0 +1,52 @@
+"""Tests für cli.py"""
+
+import json
+import os
+import tempfile
+
+import pytest
+
+# cli.py legt DATA_DIR beim Import an - nicht im Repository
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='spesen-test-'))
+
+import cli  # noqa: E402
+
+
+def test_strip_json_fence_mit_text_danach():
+    text = '```json\n{"betrag": 12.5}\n```\nHinweis: Datum war schwer lesbar.'
+    assert json.loads(cli.strip_json_fence(text)) == {'betrag': 12.5}
+
+
+def test_strip_json_fence_varianten():
+    assert cli.strip_json_fence('```json\n{"a": 1}\n```') == '{"a": 1}'
+    assert cli.strip_json_fence('```\n{"a": 1}\n```') == '{"a": 1}'
+    assert cli.strip_json_fence('```json\n{"a": 1}') == '{"a": 1}'
+    assert cli.strip_json_fence('  {"a": 1}  ') == '{"a": 1}'
+
+
+def test_save_cache_rechte_und_aufraeumen(tmp_path, monkeypatch):
+    cache_file = tmp_path / '.beleg_cache.json'
+    monkeypatch.setattr(cli, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(cli, 'CACHE_FILE', str(cache_file))
+
+    cli.save_cache({'abc': {'betrag': 1}})
+    assert cache_file.stat().st_mode & 0o777 == 0o644 & ~cli.UMASK
+    assert cli.load_cache() == {'abc': {'betrag': 1}}
+
+    # Bestehende Rechte bleiben erhalten
+    cache_file.chmod(0o664)
+    cli.save_cache({'abc': {'betrag': 2}})
+    assert cache_file.stat().st_mode & 0o777 == 0o664
+
+    # Nicht serialisierbarer Inhalt: keine Temp-Datei bleibt liegen
+    with pytest.raises(TypeError):
+        cli.save_cache({'abc': object()})
+    assert [p.name for p in tmp_path.iterdir()] == ['.beleg_cache.json']
+
+
+def test_worker_count_ungueltig(monkeypatch):
+    for value in ('abc', '0', '-1', ''):
+        monkeypatch.setenv('SPESEN_WORKERS', value)
+        assert cli.get_worker_count() == 4
+    monkeypatch.setenv('SPESEN_WORKERS', '2')
+    assert cli.get_worker_count() == 2
@@ -12,6 +12,13 @@ import json
 import os
 from pathlib import Path
 
+# Optional: orjson für schnellere JSON-Verarbeitung (Fallback: json)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(__file__), 'data'))
 CACHE_FILE = os.path.join(DATA_DIR, '.beleg_cache.json')
 
@@ -30,23 +37,54 @@ PATH_MAPPING = {
     os.path.join(os.path.dirname(__file__), 'belege'): '/app/belege',
 }
 
+# Längster Präfix zuerst, damit z.B. belege/archiv vor belege greift
+PATH_PREFIXES = sorted(PATH_MAPPING.items(), key=lambda item: len(item[0]), reverse=True)
+HOST_PREFIXES = tuple(PATH_MAPPING)
+
+
+def walk_files(root):
+    """
+    Liefert (dateiname, pfad) aller Dateien unter root - wie os.walk (top-down,
+    Symlinks auf Ordner werden nicht verfolgt), aber per os.scandir mit explizitem Stack.
+    """
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                subdirs = []
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        yield entry.name, entry.path
+                    elif not entry.is_symlink():
+                        subdirs.append(entry.path)
+        except OSError:
+            continue
+        # Umgekehrt auf den Stack, damit Unterordner in Listing-Reihenfolge besucht werden
+        stack.extend(reversed(subdirs))
+
 
-def find_file(filename, search_dirs):
-    """Sucht eine Datei rekursiv in den angegebenen Ordnern."""
+def build_file_index(search_dirs):
+    """Durchsucht die Ordner einmal und gibt {dateiname: pfad} zurück."""
+    index = {}
     for search_dir in search_dirs:
-        if not os.path.exists(search_dir):
-            continue
-        for root, dirs, files in os.walk(search_dir):
-            if filename in files:
-                return os.path.join(root, filename)
-    return None
+        for name, path in walk_files(search_dir):
+            # Erster Treffer gewinnt (Reihenfolge der Ordner)
+            index.setdefault(name, path)
+    return index
 
 
 def convert_to_container_path(host_path):
     """Konvertiert einen Host-Pfad zum Container-Pfad."""
-    for host_prefix, container_prefix in PATH_MAPPING.items():
+    # Schneller Ausschluss: ein startswith-Aufruf für alle Präfixe
+    if not host_path.startswith(HOST_PREFIXES):
+        return host_path
+    for host_prefix, container_prefix in PATH_PREFIXES:
         if host_path.startswith(host_prefix):
-            return host_path.replace(host_prefix, container_prefix, 1)
+            return container_prefix + host_path[len(host_prefix):]
     return host_path
 
 
@@ -55,8 +93,9 @@ def main():
         print(f"❌ Cache nicht gefunden: {CACHE_FILE}")
         return
 
-    with open(CACHE_FILE, 'r') as f:
-        cache = json.load(f)
+    with open(CACHE_FILE, 'rb') as f:
+        data = f.read()
+    cache = orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
 
     print(f"📦 Cache geladen: {len(cache)} Einträge")
 
@@ -71,6 +110,7 @@ def main():
     not_found = 0
 
     print("\n🔍 Suche Dateien...")
+    file_index = build_file_index(SEARCH_DIRS)
 
     for file_hash, entry in cache.items():
         # Prüfen ob Pfad bereits ein Container-Pfad ist
@@ -85,7 +125,7 @@ def main():
             continue
 
         # Datei suchen
-        found_path = find_file(datei, SEARCH_DIRS)
+        found_path = file_index.get(datei)
 
         if found_path:
             # Pfad für Container konvertieren
@@ -98,8 +138,12 @@ def main():
             print(f"   ❌ {datei} nicht gefunden")
 
     # Cache speichern
-    with open(CACHE_FILE, 'w') as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
+    if ORJSON_AVAILABLE:
+        with open(CACHE_FILE, 'wb') as f:
+            f.write(orjson.dumps(cache, option=orjson.OPT_INDENT_2))
+    else:
+        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2, ensure_ascii=False)
 
     print(f"\n📈 Zusammenfassung:")
     print(f"   ✅ Pfade ergänzt: {updated}")